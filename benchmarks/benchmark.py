@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import analise  # noqa: E402
+import crud  # noqa: E402
+import database  # noqa: E402
+import fila_escrita  # noqa: E402
+import paralelo  # noqa: E402
+import snapshot  # noqa: E402
+from gerar_dados import gerar_csv, interpretar_tamanho  # noqa: E402
+
+# =========================================================
+# Benchmark do pipeline do dashboard (sem Streamlit)
+# =========================================================
+# Para cada tamanho: gera o CSV sintético (semente fixa), importa num banco
+# temporário e cronometra a carga, os filtros, cada agregação dos gráficos
+# e as operações CRUD de uma linha. O resultado sai em JSON para comparar
+# versões.
+#
+#   python benchmarks/benchmark.py --tamanhos 10k 100k --saida bench.json
+
+FILTROS_EXEMPLO = {"estados": ["SP", "RJ"], "especialidades": ["Cardiologia", "Pediatria"], "anos": [2024]}
+
+# Agregações usadas pelos gráficos da aba Dashboard: (dimensões, métricas, opções)
+AGREGACOES = {
+    "consultas_por_mes_status": (["mes", "status_consulta"], ["consultas"], {}),
+    "consultas_por_especialidade": (["especialidade"], ["consultas"], {"ordenar_por": "consultas", "decrescente": True}),
+    "receita_por_especialidade": (["especialidade"], ["receita"], {}),
+    "top5_receita": (["especialidade"], ["receita"], {"ordenar_por": "receita", "decrescente": True, "limite": 5}),
+    "consultas_por_estado": (["estado"], ["consultas"], {"ordenar_por": "consultas", "decrescente": True}),
+    "histograma_idade": (["idade_paciente"], ["consultas"], {}),
+    "idade_media_especialidade": (["especialidade"], ["idade_media"], {}),
+    "satisfacao_especialidade": (["especialidade"], ["satisfacao_media"], {}),
+    "satisfacao_sexo": (["sexo_paciente"], ["satisfacao_media"], {}),
+    "satisfacao_estado": (["estado"], ["satisfacao_media"], {}),
+    "receita_medicacao": (["receita_medicacao"], ["consultas"], {}),
+    "receitas_especialidade": (["especialidade"], ["receitas"], {}),
+    "receitas_estado": (["estado"], ["receitas"], {}),
+}
+
+CONSULTA_EXEMPLO = (
+    1001, 500, "2024-06-15", "SP", "Cidade 1", "Cardiologia", 40, "F", 120.0,
+    "PIX", 15, 5.0, "Sim", "realizada",
+)
+
+# Escritas concorrentes: sessões simultâneas, cada uma com várias escritas
+SESSOES_ESCRITA = 8
+ESCRITAS_POR_SESSAO = 25
+
+def medir(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - inicio)
+    return {
+        "repeticoes": repeticoes,
+        "min_s": min(tempos),
+        "mediana_s": statistics.median(tempos),
+        "media_s": statistics.fmean(tempos),
+    }
+
+def cenarios(repeticoes, pasta_snapshot=None):
+    """Cenários de leitura e escrita sobre o banco já importado."""
+    resultados = {}
+    resultados["carga_completa"] = medir(crud.listar_consultas, repeticoes)
+    resultados["carga_filtrada"] = medir(
+        lambda: crud.carregar_colunas(FILTROS_EXEMPLO, ["especialidade", "tempo_espera_min", "satisfacao_paciente"]),
+        repeticoes,
+    )
+
+    for nome, (dimensoes, metricas, opcoes) in AGREGACOES.items():
+        for filtrado, filtros in (("", None), ("_filtrado", FILTROS_EXEMPLO)):
+            resultados[f"agregacao.{nome}{filtrado}"] = medir(
+                lambda: crud.agregar_consultas(filtros, dimensoes, metricas, **opcoes), repeticoes
+            )
+            resultados[f"agregacao_sem_resumo.{nome}{filtrado}"] = medir(
+                lambda: crud.agregar_consultas(filtros, dimensoes, metricas, usar_resumo=False, **opcoes),
+                repeticoes,
+            )
+
+    # Motor analítico: gráficos do modo padrão (resumido) numa chamada, por backend
+    df = crud.listar_consultas()
+    backends = [("sql", {}), ("pandas", {"df": df})]
+    if pasta_snapshot and snapshot.snapshot_disponivel():
+        inicio = time.perf_counter()
+        snapshot.atualizar_snapshot(pasta_snapshot, completo=True)
+        resultados["snapshot.exportacao_completa_s"] = time.perf_counter() - inicio
+        backends.append(("parquet", {"pasta": pasta_snapshot}))
+    for backend, opcoes in backends:
+        for filtrado, filtros in (("", None), ("_filtrado", FILTROS_EXEMPLO)):
+            resultados[f"dashboard.{backend}{filtrado}"] = medir(
+                lambda: analise.calcular_dashboard(
+                    filtros, backend=backend, graficos=analise.graficos_do_modo(), **opcoes
+                ),
+                repeticoes,
+            )
+
+    # Agregação paralela por ano/mês: 1, 2, 4... processos, até os núcleos disponíveis.
+    # A primeira chamada de cada tamanho de pool (criação dos processos) fica fora da medição.
+    processos = [1]
+    while processos[-1] * 2 <= (os.cpu_count() or 1):
+        processos.append(processos[-1] * 2)
+    if processos[-1] != (os.cpu_count() or 1):
+        processos.append(os.cpu_count())
+    for n in processos:
+        executar_paralelo = lambda: analise.calcular_dashboard(
+            None, backend="paralelo", graficos=analise.graficos_do_modo(), processos=n
+        )
+        executar_paralelo()
+        resultados[f"dashboard.paralelo_{n}p"] = medir(executar_paralelo, repeticoes)
+    base = resultados["dashboard.paralelo_1p"]["mediana_s"]
+    resultados["paralelo.aceleracao"] = {
+        str(n): base / resultados[f"dashboard.paralelo_{n}p"]["mediana_s"] for n in processos
+    }
+    paralelo.encerrar()
+
+    resultados["pagina_consultas"] = medir(
+        lambda: crud.listar_consultas_paginado(limite=50, ordenar_por="valor_consulta", busca="Cardio"),
+        repeticoes,
+    )
+
+    # CRUD de uma linha: cada repetição insere, lê, atualiza e exclui a sua
+    ids = []
+    def inserir():
+        crud.inserir_consulta(CONSULTA_EXEMPLO)
+        with database.conexao(somente_leitura=True) as conn:
+            ids.append(conn.execute("SELECT MAX(id_consulta) FROM consultas").fetchone()[0])
+    resultados["crud.inserir"] = medir(inserir, repeticoes)
+    alvo = iter(list(ids))
+    resultados["crud.obter"] = medir(lambda: crud.obter_consulta(ids[-1]), repeticoes)
+    resultados["crud.atualizar"] = medir(
+        lambda: crud.atualizar_consulta(ids[-1], CONSULTA_EXEMPLO[:-1] + ("cancelada",)), repeticoes
+    )
+    resultados["crud.excluir"] = medir(lambda: crud.excluir_consulta(next(alvo)), repeticoes)
+
+    # Sessões escrevendo ao mesmo tempo: um commit por escrita contra a fila
+    # com commits em grupo (cada sessão espera a própria escrita, como no app)
+    def concorrentes(escrever):
+        def sessao():
+            for _ in range(ESCRITAS_POR_SESSAO):
+                escrever()
+        threads = [threading.Thread(target=sessao) for _ in range(SESSOES_ESCRITA)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    resultados["crud.inserir_concorrente"] = medir(
+        lambda: concorrentes(lambda: crud.inserir_consulta(CONSULTA_EXEMPLO)), repeticoes
+    )
+    resultados["fila_escrita.inserir_concorrente"] = medir(
+        lambda: concorrentes(lambda: fila_escrita.aguardar([fila_escrita.enviar("inserir", CONSULTA_EXEMPLO)])),
+        repeticoes,
+    )
+    return resultados
+
+def executar(tamanho, repeticoes, semente, pasta):
+    total = interpretar_tamanho(tamanho)
+    caminho_csv = os.path.join(pasta, f"consultas_{tamanho}.csv")
+    caminho_db = os.path.join(pasta, f"consultas_{tamanho}.db")
+
+    inicio = time.perf_counter()
+    gerar_csv(caminho_csv, total, semente)
+    geracao = time.perf_counter() - inicio
+
+    database.configurar_banco(caminho_db)
+    database.create_table()
+    importacao = crud.importar_csv_para_banco(caminho_csv)
+
+    resultados = {
+        "linhas": total,
+        "geracao_csv_s": geracao,
+        "importacao": importacao,
+        "tamanho_banco_bytes": os.path.getsize(caminho_db),
+    }
+    resultados.update(cenarios(repeticoes, os.path.join(pasta, f"snapshot_{tamanho}")))
+
+    memoria = crud.listar_consultas().attrs["memoria"]
+    resultados["memoria_df_bytes"] = memoria
+    return resultados
+
+def metadados(semente, repeticoes):
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "semente": semente,
+        "repeticoes": repeticoes,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline do dashboard")
+    parser.add_argument("--tamanhos", nargs="+", default=["10k", "100k"],
+                        help="tamanhos dos datasets (10k, 100k, 1M, 10M)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default="bench_output.json", help="arquivo JSON de resultados")
+    parser.add_argument("--pasta", help="pasta para CSVs/bancos gerados (padrão: temporária)")
+    args = parser.parse_args()
+
+    saida = {"metadados": metadados(args.semente, args.repeticoes), "resultados": {}}
+    with tempfile.TemporaryDirectory() as temporaria:
+        pasta = args.pasta or temporaria
+        os.makedirs(pasta, exist_ok=True)
+        for tamanho in args.tamanhos:
+            print(f"▶ {tamanho}...", flush=True)
+            resultado = executar(tamanho, args.repeticoes, args.semente, pasta)
+            saida["resultados"][tamanho] = resultado
+            print(f"  importação: {resultado['importacao']['linhas_por_segundo']:.0f} linhas/s, "
+                  f"carga completa: {resultado['carga_completa']['mediana_s']:.3f}s")
+
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(saida, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.saida}")
@@ -0,0 +1,116 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# =========================================================
+# Gerador de dados sintéticos (mesmo esquema de dataset_saude.csv)
+# =========================================================
+# As proporções imitam o CSV original: status, estados, especialidades,
+# valor por especialidade e satisfação/receita só em consultas realizadas.
+# Com a mesma semente o arquivo gerado é sempre o mesmo.
+#
+#   python benchmarks/gerar_dados.py 100k data/sintetico_100k.csv
+
+COLUNAS = [
+    "id_consulta", "id_paciente", "id_medico", "data_consulta", "especialidade",
+    "valor_consulta", "status_consulta", "cidade", "estado", "forma_pagamento",
+    "idade_paciente", "sexo_paciente", "tempo_espera_min", "satisfacao_paciente",
+    "receita_medicacao",
+]
+
+ESTADOS = {
+    "SP": 0.252, "MG": 0.152, "RJ": 0.144, "RS": 0.080, "BA": 0.079,
+    "PE": 0.073, "SC": 0.072, "PR": 0.070, "GO": 0.050, "DF": 0.028,
+}
+
+# Especialidade -> (valor médio, desvio)
+ESPECIALIDADES = {
+    "Cardiologia": (46.5, 25.1),
+    "Clinica Geral": (22.1, 9.4),
+    "Dermatologia": (41.1, 22.5),
+    "Ginecologia": (34.9, 19.3),
+    "Neurologia": (66.1, 44.8),
+    "Ortopedia": (38.0, 19.9),
+    "Pediatria": (23.6, 9.3),
+    "Psiquiatria": (78.4, 51.0),
+}
+
+STATUS = {"realizada": 0.7133, "cancelada": 0.1761, "nao compareceu": 0.1106}
+PAGAMENTOS = ["Convenio", "Dinheiro", "Cartao", "PIX"]
+SATISFACAO = {1.0: 0.013, 2.0: 0.084, 3.0: 0.159, 4.0: 0.311, 5.0: 0.433}
+TOTAL_CIDADES = 3000
+
+INICIO = np.datetime64("2023-01-01T00:00")
+MINUTOS_PERIODO = int((np.datetime64("2026-01-01T00:00") - INICIO) / np.timedelta64(1, "m"))
+
+def _sortear(rng, opcoes, n):
+    chaves = list(opcoes)
+    pesos = np.array(list(opcoes.values()), dtype=float)
+    return np.array(chaves, dtype=object)[rng.choice(len(chaves), size=n, p=pesos / pesos.sum())]
+
+def _lote(rng, primeiro_id, n):
+    especialidade = _sortear(rng, {e: 1 for e in ESPECIALIDADES}, n)
+    media = np.array([ESPECIALIDADES[e][0] for e in especialidade])
+    desvio = np.array([ESPECIALIDADES[e][1] for e in especialidade])
+    # Lognormal com a média e o desvio de cada especialidade
+    sigma2 = np.log1p((desvio / media) ** 2)
+    valor = rng.lognormal(np.log(media) - sigma2 / 2, np.sqrt(sigma2))
+
+    status = _sortear(rng, STATUS, n)
+    realizada = status == "realizada"
+    satisfacao = np.where(realizada, _sortear(rng, SATISFACAO, n).astype(float), np.nan)
+    receita = np.where(realizada, rng.choice(["Sim", "Nao"], size=n), None)
+
+    minutos = rng.integers(0, MINUTOS_PERIODO, size=n)
+    datas = (INICIO + minutos.astype("timedelta64[m]")).astype("datetime64[s]")
+
+    return pd.DataFrame({
+        "id_consulta": np.arange(primeiro_id, primeiro_id + n),
+        "id_paciente": rng.integers(1001, 10000, size=n),
+        "id_medico": rng.integers(500, 801, size=n),
+        "data_consulta": pd.Series(datas).dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "especialidade": especialidade,
+        "valor_consulta": np.round(valor, 2),
+        "status_consulta": status,
+        "cidade": np.char.add("Cidade ", rng.integers(1, TOTAL_CIDADES + 1, size=n).astype(str)),
+        "estado": _sortear(rng, ESTADOS, n),
+        "forma_pagamento": rng.choice(PAGAMENTOS, size=n),
+        "idade_paciente": rng.integers(1, 91, size=n),
+        "sexo_paciente": rng.choice(["F", "M"], size=n),
+        "tempo_espera_min": np.clip(np.round(rng.gamma(2.0, 10.5, size=n)), 0, 180).astype(int),
+        "satisfacao_paciente": satisfacao,
+        "receita_medicacao": receita,
+    }, columns=COLUNAS)
+
+def gerar_consultas(total, semente=42, tamanho_lote=200_000):
+    """Gera o dataset em lotes (DataFrames), sem montar tudo em memória."""
+    rng = np.random.default_rng(semente)
+    gerados = 0
+    while gerados < total:
+        n = min(tamanho_lote, total - gerados)
+        yield _lote(rng, gerados + 1, n)
+        gerados += n
+
+def gerar_csv(caminho, total, semente=42):
+    for i, lote in enumerate(gerar_consultas(total, semente)):
+        lote.to_csv(caminho, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    return caminho
+
+def interpretar_tamanho(texto):
+    """'10k' -> 10_000, '1M' -> 1_000_000."""
+    texto = str(texto).strip().lower()
+    multiplicador = {"k": 1_000, "m": 1_000_000}.get(texto[-1], 1)
+    numero = texto[:-1] if texto[-1] in "km" else texto
+    return int(float(numero) * multiplicador)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um CSV sintético de consultas")
+    parser.add_argument("tamanho", help="número de linhas (ex.: 10k, 100k, 1M, 10M)")
+    parser.add_argument("saida", help="caminho do CSV gerado")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    total = interpretar_tamanho(args.tamanho)
+    gerar_csv(args.saida, total, args.semente)
+    print(f"{total} linhas gravadas em {args.saida}")
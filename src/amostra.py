@@ -0,0 +1,244 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import analise
+from crud import _clausula_where, _consultar_df, montar_filtros, versoes_por_mes
+from database import conexao
+
+# =========================================================
+# Amostra estratificada para a prévia rápida do dashboard
+# =========================================================
+# consultas_amostra guarda, para cada estrato (ano_mes x estado x
+# especialidade), as primeiras linhas numa ordem pseudoaleatória fixa
+# (hash do id): TAXA_AMOSTRA do estrato, com no mínimo MINIMO_ESTRATO
+# linhas (ou o estrato inteiro, se for menor). Como a snapshot Parquet,
+# atualizar_amostra refaz só os meses cuja versão (versoes_dados) mudou.
+#
+# A atualização não roda no caminho da leitura: os meses existentes vêm do
+# resumo mensal e as versões de tabelas pequenas, então conferir se a
+# amostra está em dia custa milissegundos. Quando não está, ela é refeita
+# numa thread, um mês por transação (o lock de escrita fica preso só
+# durante um mês, não durante a amostra inteira).
+#
+# Os filtros da barra lateral são todos por estrato, então as estimativas
+# filtradas usam estratos inteiros: totais com peso N_h / n_h e médias como
+# razão de totais, com intervalo de confiança de 95% pelo estimador
+# estratificado (com correção de população finita). Cada métrica sai com
+# uma coluna <métrica>_erro (meia largura do intervalo).
+
+TAXA_AMOSTRA = 0.02
+MINIMO_ESTRATO = 20
+Z_95 = 1.96
+ESTRATO = ["ano_mes", "estado", "especialidade"]
+
+COLUNAS_AMOSTRA = [
+    "id_consulta", "ano_mes", "estado", "especialidade", "status_consulta", "sexo_paciente",
+    "receita_medicacao", "idade_paciente", "valor_consulta", "tempo_espera_min",
+    "satisfacao_paciente",
+]
+
+# Ordem pseudoaleatória estável: a amostra de um estrato só muda onde ele mudou
+ORDEM_HASH = "(id_consulta * 2654435761) % 4294967296"
+
+def _sql_amostrar(condicao):
+    colunas = ", ".join(COLUNAS_AMOSTRA)
+    return f"""
+    INSERT INTO consultas_amostra ({colunas}, populacao)
+    SELECT {colunas}, populacao FROM (
+        SELECT {", ".join(c if c != "ano_mes" else "COALESCE(ano_mes, 0) AS ano_mes" for c in COLUNAS_AMOSTRA)},
+               ROW_NUMBER() OVER estrato AS ordem,
+               COUNT(*) OVER (PARTITION BY ano_mes, estado, especialidade) AS populacao
+        FROM consultas
+        WHERE {condicao}
+        WINDOW estrato AS (PARTITION BY ano_mes, estado, especialidade ORDER BY {ORDEM_HASH})
+    )
+    WHERE ordem <= MAX(?, CAST(populacao * ? + 0.5 AS INTEGER))
+    """
+
+def _meses_desatualizados(conn):
+    """
+    (versão atual de cada mês com consultas, meses a refazer). Lê só
+    versoes_dados, amostra_versoes e o resumo mensal; nunca a tabela consultas.
+    """
+    atuais = versoes_por_mes(conn)
+    amostrados = dict(conn.execute("SELECT ano_mes, versao FROM amostra_versoes").fetchall())
+    refeitos = sorted(
+        {am for am, versao in atuais.items() if amostrados.get(am) != versao}
+        | (set(amostrados) - set(atuais))
+    )
+    return atuais, refeitos
+
+def atualizar_amostra(completo=False, taxa=TAXA_AMOSTRA, minimo=MINIMO_ESTRATO):
+    """
+    Refaz a amostra dos meses novos ou alterados desde a última atualização.
+    Retorna a lista de ano_mes refeitos (0 = consultas sem data).
+    """
+    if completo:
+        with conexao() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM consultas_amostra")
+            conn.execute("DELETE FROM amostra_versoes")
+    with conexao(somente_leitura=True) as conn:
+        _, pendentes = _meses_desatualizados(conn)
+
+    refeitos = []
+    for ano_mes in pendentes:
+        with conexao() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Confere de novo com o lock: outra atualização pode ter chegado antes
+            atuais, desatualizados = _meses_desatualizados(conn)
+            if ano_mes not in desatualizados:
+                continue
+            conn.execute("DELETE FROM consultas_amostra WHERE ano_mes = ?", (ano_mes,))
+            conn.execute("DELETE FROM amostra_versoes WHERE ano_mes = ?", (ano_mes,))
+            if ano_mes in atuais:
+                condicao = "ano_mes IS NULL" if ano_mes == 0 else "ano_mes = ?"
+                conn.execute(_sql_amostrar(condicao), ([] if ano_mes == 0 else [ano_mes]) + [minimo, taxa])
+                conn.execute(
+                    "INSERT INTO amostra_versoes (ano_mes, versao) VALUES (?, ?)", (ano_mes, atuais[ano_mes])
+                )
+            refeitos.append(ano_mes)
+    return refeitos
+
+_thread_atualizacao = None
+_lock_atualizacao = threading.Lock()
+
+def atualizar_em_segundo_plano():
+    """Roda atualizar_amostra numa thread (uma por vez). False se já havia uma rodando."""
+    global _thread_atualizacao
+    with _lock_atualizacao:
+        if _thread_atualizacao is not None and _thread_atualizacao.is_alive():
+            return False
+        _thread_atualizacao = threading.Thread(target=atualizar_amostra, name="amostra", daemon=True)
+        _thread_atualizacao.start()
+        return True
+
+def amostra_atualizada():
+    """True se a amostra cobre a versão atual de todos os meses; senão agenda a atualização."""
+    with conexao(somente_leitura=True) as conn:
+        _, refeitos = _meses_desatualizados(conn)
+    if refeitos:
+        atualizar_em_segundo_plano()
+    return not refeitos
+
+def carregar_amostra(filtros=None):
+    """Linhas da amostra que passam nos filtros, com o peso N_h / n_h de cada uma."""
+    condicoes, parametros = montar_filtros(filtros)
+    df = _consultar_df(
+        f"SELECT {', '.join(COLUNAS_AMOSTRA[1:])}, populacao FROM consultas_amostra {_clausula_where(condicoes)}",
+        parametros,
+    )
+    df["amostrados"] = df.groupby(ESTRATO, dropna=False)["populacao"].transform("size")
+    df["peso"] = df["populacao"] / df["amostrados"]
+    df["receita_sim"] = (df["receita_medicacao"] == "Sim").astype("int64")
+    return df
+
+# =========================================================
+# Estimativas com intervalo de confiança
+# =========================================================
+# Métrica -> (coluna somada, coluna que define o denominador ou None p/ totais)
+ESTIMATIVAS = {
+    "consultas": (None, None),
+    "receita": ("valor_consulta", None),
+    "idade_media": ("idade_paciente", "idade_paciente"),
+    "satisfacao_media": ("satisfacao_paciente", "satisfacao_paciente"),
+    "espera_media": ("tempo_espera_min", "tempo_espera_min"),
+    "receitas": ("receita_sim", None),
+}
+
+def _variancia_estratificada(somas, chaves):
+    """
+    Variância do total estimado por grupo: soma, nos estratos, de
+    N_h² (1 - n_h/N_h) s²_h / n_h, com s²_h a partir de S_z e S_zz.
+    """
+    n = somas["amostrados"]
+    s2 = (somas["S_zz"] - somas["S_z"] ** 2 / n) / (n - 1)
+    s2 = s2.where(n > 1, 0.0).clip(lower=0)
+    parcela = somas["populacao"] ** 2 * (1 - n / somas["populacao"]) * s2 / n
+    return parcela.groupby([somas[c] for c in chaves], sort=True).sum()
+
+def estimar(df, dimensoes, metricas):
+    """Estimativas (e meias larguras do IC 95%) das métricas por grupo de `dimensoes`."""
+    if "mes" in dimensoes:
+        # Consultas sem data (ano_mes 0) ficam fora da série mensal, como nos outros backends
+        df = df.assign(mes=df["ano_mes"].map(lambda v: f"{v // 100:04d}-{v % 100:02d}" if v else None))
+    df = df.dropna(subset=dimensoes)
+    grupos = list(dimensoes)
+    chaves_estrato = ESTRATO + [d for d in grupos if d not in ESTRATO]
+
+    valores = {"_um": 1.0}
+    for metrica in metricas:
+        soma, denominador = ESTIMATIVAS[metrica]
+        if soma:
+            valores[f"y_{metrica}"] = df[soma].astype("float64").fillna(0.0)
+            valores[f"yy_{metrica}"] = valores[f"y_{metrica}"] ** 2
+        if denominador:
+            valores[f"x_{metrica}"] = df[denominador].notna().astype("float64")
+    base = df.assign(**valores)
+    colunas_soma = [c for c in valores]
+    somas = base.groupby(chaves_estrato, dropna=False, sort=False).agg(
+        **{c: (c, "sum") for c in colunas_soma},
+        populacao=("populacao", "first"),
+        amostrados=("amostrados", "first"),
+        peso=("peso", "first"),
+    ).reset_index()
+
+    def total(coluna):
+        return (somas[coluna] * somas["peso"]).groupby([somas[c] for c in grupos], sort=True).sum()
+
+    resultado = pd.DataFrame(index=total("_um").index)
+    for metrica in metricas:
+        soma, denominador = ESTIMATIVAS[metrica]
+        if soma is None or denominador is None:
+            # Total: contagem (indicador 0/1) ou soma de uma coluna
+            coluna = "_um" if soma is None else f"y_{metrica}"
+            quadrado = "_um" if soma is None else f"yy_{metrica}"
+            estimativa = total(coluna)
+            variancia = _variancia_estratificada(
+                somas.assign(S_z=somas[coluna], S_zz=somas[quadrado]), grupos
+            )
+        else:
+            # Média = razão de totais; variância linearizada com z = y - R·x
+            t_y, t_x = total(f"y_{metrica}"), total(f"x_{metrica}")
+            estimativa = t_y / t_x.where(t_x > 0)
+            razao = pd.MultiIndex.from_frame(somas[grupos]) if len(grupos) > 1 else somas[grupos[0]]
+            r = estimativa.reindex(razao).to_numpy()
+            s_y, s_x = somas[f"y_{metrica}"], somas[f"x_{metrica}"]
+            s_zz = somas[f"yy_{metrica}"] - 2 * r * s_y + r ** 2 * s_x  # x é 0/1: Σxy = Σy e Σx² = Σx
+            variancia = _variancia_estratificada(
+                somas.assign(S_z=s_y - r * s_x, S_zz=s_zz), grupos
+            ) / t_x.where(t_x > 0) ** 2
+        resultado[metrica] = estimativa
+        resultado[f"{metrica}_erro"] = Z_95 * np.sqrt(variancia)
+    return resultado.reset_index()
+
+def _histograma(df, dimensoes):
+    """Contagens estimadas por célula (arredondadas: os quartis usam inteiros)."""
+    return (
+        df.dropna(subset=dimensoes).groupby(dimensoes, sort=True)["peso"].sum()
+        .round().astype("int64").reset_index(name="consultas")
+        .query("consultas > 0")
+    )
+
+def criar_backend(filtros, limite_amostra=analise.LIMITE_AMOSTRA):
+    """
+    Backend "amostra": intermediários estimados a partir de consultas_amostra.
+    Usa a amostra como está; se ela estiver atrasada, a atualização é agendada.
+    """
+    amostra_atualizada()
+    df = carregar_amostra(filtros)
+
+    def calcular(nome):
+        if nome == "linhas_espera":
+            return df[analise.COLUNAS_ESPERA]
+        if nome == "amostra_espera":
+            # Sorteio com peso N_h / n_h: cada estrato entra na proporção da população
+            sorteio = df.sample(n=min(limite_amostra, len(df)), weights="peso") if len(df) else df
+            return sorteio[analise.COLUNAS_ESPERA]
+        dimensoes, metricas = analise.INTERMEDIARIOS[nome]
+        if nome.startswith("hist_"):
+            return _histograma(df, dimensoes)
+        return estimar(df, dimensoes, metricas)
+    return calcular
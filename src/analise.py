@@ -0,0 +1,299 @@
+import numpy as np
+import pandas as pd
+
+import crud
+from perfil import medir
+
+# =========================================================
+# Motor analítico do dashboard
+# =========================================================
+# calcular_dashboard(filtros) devolve os dados de todos os gráficos da aba
+# Dashboard em um dicionário {nome_do_grafico: DataFrame}. Cada gráfico é
+# derivado de um "intermediário" (ex.: agregados por especialidade), que é
+# calculado uma única vez por chamada e compartilhado entre os gráficos.
+#
+# Os backends só sabem produzir intermediários; as derivações dos gráficos
+# são as mesmas para todos. Não depende do Streamlit.
+
+COLUNAS_ESPERA = ["especialidade", "tempo_espera_min", "satisfacao_paciente"]
+
+# Intermediário -> (dimensões, métricas) para os backends que agregam
+INTERMEDIARIOS = {
+    "por_mes_status": (["mes", "status_consulta"], ["consultas"]),
+    "por_especialidade": (["especialidade"], ["consultas", "receita", "idade_media", "satisfacao_media", "receitas"]),
+    "por_estado": (["estado"], ["consultas", "satisfacao_media", "receitas"]),
+    "por_sexo": (["sexo_paciente"], ["satisfacao_media"]),
+    "por_receita": (["receita_medicacao"], ["consultas"]),
+    "por_idade": (["idade_paciente"], ["consultas"]),
+    # Histogramas exatos (tempo de espera é inteiro): deles saem os quartis do
+    # boxplot, a densidade e a correlação sem enviar linhas ao navegador
+    "hist_espera": (["especialidade", "tempo_espera_min"], ["consultas"]),
+    "hist_espera_satisfacao": (["tempo_espera_min", "satisfacao_paciente"], ["consultas"]),
+}
+
+LIMITE_AMOSTRA = 5000
+
+def _quantis_histograma(valores, contagens, probabilidades):
+    """Quantis com interpolação linear (como pandas/plotly) a partir de um histograma ordenado."""
+    acumulado = np.cumsum(contagens)
+    n = acumulado[-1]
+    quantis = []
+    for p in probabilidades:
+        posicao = p * (n - 1)
+        baixo, alto = int(np.floor(posicao)), int(np.ceil(posicao))
+        v_baixo = valores[np.searchsorted(acumulado, baixo, side="right")]
+        v_alto = valores[np.searchsorted(acumulado, alto, side="right")]
+        quantis.append(v_baixo + (v_alto - v_baixo) * (posicao - baixo))
+    return quantis
+
+def _estatisticas_boxplot(hist):
+    """Quartis e bigodes (1,5 x IQR) por especialidade, calculados no servidor."""
+    linhas = []
+    for especialidade, grupo in hist.groupby("especialidade", sort=True, observed=True):
+        grupo = grupo.sort_values("tempo_espera_min")
+        valores = grupo["tempo_espera_min"].to_numpy(dtype=float)
+        contagens = grupo["consultas"].to_numpy(dtype="int64")
+        q1, mediana, q3 = _quantis_histograma(valores, contagens, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        dentro = valores[(valores >= q1 - 1.5 * iqr) & (valores <= q3 + 1.5 * iqr)]
+        fora = (valores < q1 - 1.5 * iqr) | (valores > q3 + 1.5 * iqr)
+        linhas.append({
+            "especialidade": especialidade,
+            "consultas": int(contagens.sum()),
+            "media": float((valores * contagens).sum() / contagens.sum()),
+            "q1": q1, "mediana": mediana, "q3": q3,
+            "limite_inferior": dentro.min(), "limite_superior": dentro.max(),
+            "outliers": int(contagens[fora].sum()),
+        })
+    return pd.DataFrame(linhas, columns=[
+        "especialidade", "consultas", "media", "q1", "mediana", "q3",
+        "limite_inferior", "limite_superior", "outliers",
+    ])
+
+def _correlacao_histograma(hist):
+    """Coeficiente de Pearson exato a partir das contagens por (espera, satisfação)."""
+    w = hist["consultas"].to_numpy(dtype=float)
+    x = hist["tempo_espera_min"].to_numpy(dtype=float)
+    y = hist["satisfacao_paciente"].to_numpy(dtype=float)
+    n = w.sum()
+    r = np.nan
+    if n > 1:
+        sx, sy = (w * x).sum(), (w * y).sum()
+        cov = n * (w * x * y).sum() - sx * sy
+        var_x = n * (w * x * x).sum() - sx ** 2
+        var_y = n * (w * y * y).sum() - sy ** 2
+        if var_x > 0 and var_y > 0:
+            r = cov / np.sqrt(var_x * var_y)
+    return pd.DataFrame({"consultas": [int(n)], "pearson": [r]})
+
+def _colunas(df, colunas):
+    """Seleciona colunas, levando junto as margens de erro (<coluna>_erro) quando houver."""
+    return df[colunas + [f"{c}_erro" for c in colunas if f"{c}_erro" in df.columns]]
+
+def _ordenar(df, coluna, limite=None):
+    df = df.sort_values(coluna, ascending=False, kind="stable").reset_index(drop=True)
+    return df.head(limite) if limite else df
+
+# Gráfico -> (intermediário, derivação)
+GRAFICOS = {
+    "consultas_tempo": ("por_mes_status", lambda d: d),
+    "especialidades": ("por_especialidade", lambda d: _ordenar(_colunas(d, ["especialidade", "consultas"]), "consultas")),
+    "receita_especialidade": ("por_especialidade", lambda d: _colunas(d, ["especialidade", "receita"])),
+    "top5_receita": ("por_especialidade", lambda d: _ordenar(_colunas(d, ["especialidade", "receita"]), "receita", 5)),
+    "geografia": ("por_estado", lambda d: _ordenar(_colunas(d, ["estado", "consultas"]), "consultas")),
+    "idades": ("por_idade", lambda d: d),
+    "idade_especialidade": ("por_especialidade", lambda d: _colunas(d, ["especialidade", "idade_media"])),
+    "espera": ("linhas_espera", lambda d: _colunas(d, ["especialidade", "tempo_espera_min"])),
+    "correlacao": ("linhas_espera", lambda d: d.dropna(subset=["satisfacao_paciente"])),
+    "espera_resumo": ("hist_espera", _estatisticas_boxplot),
+    "correlacao_densidade": ("hist_espera_satisfacao", lambda d: d),
+    "correlacao_amostra": ("amostra_espera", lambda d: d.dropna(subset=["satisfacao_paciente"])),
+    "correlacao_coeficiente": ("hist_espera_satisfacao", _correlacao_histograma),
+    "satisfacao_especialidade": ("por_especialidade", lambda d: _colunas(d, ["especialidade", "satisfacao_media"])),
+    "satisfacao_sexo": ("por_sexo", lambda d: d),
+    "satisfacao_estado": ("por_estado", lambda d: _colunas(d, ["estado", "satisfacao_media"])),
+    "receita_percentual": ("por_receita", lambda d: d),
+    "receitas_especialidade": ("por_especialidade", lambda d: _colunas(d.loc[d["receitas"] > 0], ["especialidade", "receitas"])),
+    "receitas_estado": ("por_estado", lambda d: _colunas(d.loc[d["receitas"] > 0], ["estado", "receitas"])),
+}
+
+# Tempo de espera/correlação: no modo "completo" as linhas brutas vão para o
+# navegador; no "resumido" vão só quartis, densidade (ou amostra) e o r
+GRAFICOS_LINHAS_BRUTAS = ["espera", "correlacao"]
+
+def graficos_do_modo(modo="resumido", correlacao="densidade"):
+    """Lista de gráficos a calcular para o modo de renderização escolhido."""
+    resumidos = ["espera_resumo", "correlacao_densidade", "correlacao_amostra", "correlacao_coeficiente"]
+    base = [g for g in GRAFICOS if g not in GRAFICOS_LINHAS_BRUTAS and g not in resumidos]
+    if modo == "completo":
+        return base + GRAFICOS_LINHAS_BRUTAS
+    return base + ["espera_resumo", f"correlacao_{correlacao}", "correlacao_coeficiente"]
+
+# Seções da aba Dashboard -> gráficos de cada uma (o app só calcula as
+# seções visíveis; no tempo de espera, graficos_do_modo escolhe entre eles)
+SECOES = {
+    "volume": ["consultas_tempo"],
+    "especialidades": ["especialidades"],
+    "receita": ["receita_especialidade", "top5_receita"],
+    "geografia": ["geografia"],
+    "pacientes": ["idades", "idade_especialidade"],
+    "espera": ["espera", "correlacao", "espera_resumo", "correlacao_densidade",
+               "correlacao_amostra", "correlacao_coeficiente"],
+    "satisfacao": ["satisfacao_especialidade", "satisfacao_sexo", "satisfacao_estado"],
+    "medicacao": ["receita_percentual", "receitas_especialidade", "receitas_estado"],
+}
+
+# =========================================================
+# Backends
+# =========================================================
+def _backend_sql(filtros, limite_amostra=LIMITE_AMOSTRA):
+    """Intermediários calculados no SQLite (resumo mensal quando possível)."""
+    def calcular(nome):
+        if nome == "linhas_espera":
+            return crud.carregar_colunas(filtros, COLUNAS_ESPERA)
+        if nome == "amostra_espera":
+            return crud.amostrar_colunas(filtros, COLUNAS_ESPERA, limite=limite_amostra)
+        dimensoes, metricas = INTERMEDIARIOS[nome]
+        return crud.agregar_consultas(filtros, dimensoes, metricas)
+    return calcular
+
+def usa_resumo(graficos, backend="sql"):
+    """True se o backend responde todos os `graficos` pelo resumo mensal (custo constante)."""
+    if backend != "sql":
+        return False
+    origens = {GRAFICOS[nome][0] for nome in graficos}
+    return all(
+        origem in INTERMEDIARIOS and crud._pode_usar_resumo(*INTERMEDIARIOS[origem])
+        for origem in origens
+    )
+
+def filtrar_df(df, filtros=None):
+    """Os mesmos filtros da barra lateral, aplicados a um DataFrame já carregado."""
+    filtros = filtros or {}
+    mascara = pd.Series(True, index=df.index)
+    if filtros.get("estados"):
+        mascara &= df["estado"].isin(filtros["estados"])
+    if filtros.get("especialidades"):
+        mascara &= df["especialidade"].isin(filtros["especialidades"])
+    if filtros.get("meses"):
+        mascara &= df["data_consulta"].dt.month.isin(filtros["meses"])
+    if filtros.get("anos"):
+        mascara &= df["data_consulta"].dt.year.isin(filtros["anos"])
+    return df[mascara]
+
+def _agregar_df(df, dimensoes):
+    """Um único groupby com todas as métricas que os gráficos usam."""
+    return df.groupby(dimensoes, observed=True, sort=True).agg(
+        consultas=("especialidade", "size"),
+        receita=("valor_consulta", "sum"),
+        idade_media=("idade_paciente", "mean"),
+        satisfacao_media=("satisfacao_paciente", "mean"),
+        receitas=("receita_sim", "sum"),
+    ).reset_index()
+
+def _amostrar_df(df, limite, estrato="especialidade"):
+    """Amostra estratificada proporcional, como crud.amostrar_colunas."""
+    fracao = min(1.0, limite / len(df)) if len(df) else 1.0
+    # Seleção explícita das colunas: no pandas 3 o apply descarta a coluna do grupo
+    return df.groupby(estrato, observed=True, group_keys=False)[list(df.columns)].apply(
+        lambda g: g.sample(n=max(1, int(len(g) * fracao)))
+    )
+
+def _backend_pandas(filtros, df=None, limite_amostra=LIMITE_AMOSTRA):
+    """Intermediários calculados em memória sobre o DataFrame tipado."""
+    df = filtrar_df(crud.listar_consultas() if df is None else df, filtros)
+    df = df.assign(receita_sim=(df["receita_medicacao"] == "Sim").astype("int64"))
+
+    def calcular(nome):
+        if nome == "linhas_espera":
+            return df[COLUNAS_ESPERA]
+        if nome == "amostra_espera":
+            return _amostrar_df(df[COLUNAS_ESPERA], limite_amostra)
+        dimensoes, metricas = INTERMEDIARIOS[nome]
+        if nome.startswith("hist_"):
+            return (
+                df.dropna(subset=dimensoes)
+                .groupby(dimensoes, observed=True, sort=True).size()
+                .reset_index(name="consultas")
+            )
+        if "mes" not in dimensoes:
+            return _agregar_df(df, dimensoes)[dimensoes + metricas]
+        # Agrupa pelo período (rápido) e só formata "AAAA-MM" no resultado
+        agregado = _agregar_df(df.assign(mes=df["data_consulta"].dt.to_period("M")), dimensoes)
+        return agregado.assign(mes=agregado["mes"].astype(str))[dimensoes + metricas]
+    return calcular
+
+# Colunas que o backend pandas usa (o snapshot lê só estas)
+COLUNAS_ANALISE = [
+    "data_consulta", "estado", "especialidade", "idade_paciente", "sexo_paciente",
+    "valor_consulta", "tempo_espera_min", "satisfacao_paciente", "receita_medicacao",
+    "status_consulta",
+]
+
+def _backend_parquet(filtros, limite_amostra=LIMITE_AMOSTRA, **opcoes):
+    """Backend pandas alimentado pelo snapshot Parquet (partições/colunas podadas)."""
+    import snapshot  # depende do pyarrow, só importado quando usado
+
+    # Só regrava partições se houve escrita desde a última exportação; em
+    # dia, a conferência lê só tabelas pequenas e o manifesto
+    if not snapshot.snapshot_atualizado(**opcoes):
+        snapshot.atualizar_snapshot(**opcoes)
+    df = snapshot.carregar_snapshot(filtros, COLUNAS_ANALISE, **opcoes)
+    # O snapshot já veio filtrado; o filtro em memória só confirma
+    return _backend_pandas(filtros, df=df, limite_amostra=limite_amostra)
+
+def _backend_paralelo(filtros, **opcoes):
+    """Agregações divididas por ano/mês (ou estado) num pool de processos."""
+    import paralelo  # importado só quando usado (cria processos)
+
+    return paralelo.criar_backend(filtros, **opcoes)
+
+def _backend_amostra(filtros, **opcoes):
+    """Estimativas (com IC 95%) a partir da amostra estratificada mantida no banco."""
+    import amostra
+
+    return amostra.criar_backend(filtros, **opcoes)
+
+BACKENDS = {
+    "sql": _backend_sql,
+    "pandas": _backend_pandas,
+    "parquet": _backend_parquet,
+    "paralelo": _backend_paralelo,
+    "amostra": _backend_amostra,
+}
+
+def registrar_backend(nome, fabrica):
+    """
+    Registra um backend. `fabrica(filtros, **opcoes)` deve devolver uma
+    função que recebe o nome de um intermediário e retorna o DataFrame.
+    Se essa função tiver o atributo `preparar`, ele recebe antes a lista de
+    intermediários da chamada (para calculá-los de uma vez).
+    """
+    BACKENDS[nome] = fabrica
+
+# =========================================================
+# Ponto de entrada
+# =========================================================
+def calcular_dashboard(filtros=None, backend="sql", graficos=None, **opcoes):
+    """
+    Dados de todos os gráficos (ou só dos `graficos` pedidos) para os filtros.
+
+    Cada intermediário é calculado uma vez e reaproveitado pelos gráficos
+    que dependem dele. `opcoes` é repassado ao backend (ex.: df=... no pandas).
+    """
+    calcular = BACKENDS[backend](filtros, **opcoes)
+    graficos = graficos or list(GRAFICOS)
+    if hasattr(calcular, "preparar"):
+        calcular.preparar(list(dict.fromkeys(GRAFICOS[nome][0] for nome in graficos)))
+    intermediarios = {}
+    resultado = {}
+    for nome in graficos:
+        origem, derivar = GRAFICOS[nome]
+        if origem not in intermediarios:
+            with medir(f"analise.{backend}.{origem}") as medicao:
+                intermediarios[origem] = calcular(origem)
+                if medicao is not None:
+                    medicao["linhas"] = len(intermediarios[origem])
+        with medir(f"analise.grafico.{nome}"):
+            resultado[nome] = derivar(intermediarios[origem]).reset_index(drop=True)
+    return resultado
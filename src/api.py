@@ -0,0 +1,211 @@
+import argparse
+import csv
+import io
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import analise
+import crud
+from cache import em_cache
+from database import create_table
+from perfil import medir
+
+# =========================================================
+# API HTTP/JSON das agregações do dashboard
+# =========================================================
+# Serve os mesmos dados dos gráficos (analise.calcular_dashboard) sem rodar
+# o Streamlit, com os filtros da barra lateral na query string:
+#
+#   python src/api.py --porta 8502
+#   curl 'localhost:8502/graficos/consultas_tempo?estados=SP,RJ&anos=2024'
+#   curl 'localhost:8502/secoes/satisfacao?especialidades=Cardiologia'
+#   curl 'localhost:8502/exportar.csv?meses=1,2&colunas=id_consulta,valor_consulta'
+#
+# Cada resposta leva um ETag com a versão dos dados (crud.versao_dados) dos
+# filtros pedidos; com If-None-Match igual a resposta é 304, sem recalcular
+# nada. As exportações (CSV e NDJSON) saem em lotes com chunked encoding,
+# sem montar o resultado inteiro em memória.
+
+PORTA_PADRAO = 8502
+LINHAS_POR_LOTE = 5000
+
+FILTROS_TEXTO = ("estados", "especialidades")
+FILTROS_NUMERO = ("meses", "anos")
+
+calcular_dashboard = em_cache(analise.calcular_dashboard)
+
+class ErroRequisicao(ValueError):
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+def _lista(parametros, nome):
+    """Aceita ?nome=a,b e ?nome=a&nome=b."""
+    return [v for valor in parametros.get(nome, []) for v in valor.split(",") if v]
+
+def ler_filtros(parametros):
+    """Filtros da barra lateral a partir da query string."""
+    filtros = {nome: _lista(parametros, nome) for nome in FILTROS_TEXTO}
+    for nome in FILTROS_NUMERO:
+        try:
+            filtros[nome] = [int(v) for v in _lista(parametros, nome)]
+        except ValueError:
+            raise ErroRequisicao(f"{nome} deve ser uma lista de números") from None
+    return filtros
+
+def _tabela_json(df):
+    return df.to_json(orient="records", force_ascii=False, date_format="iso")
+
+class ManipuladorApi(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "DashboardSaudeAPI"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parametros = parse_qs(url.query)
+        partes = [p for p in url.path.split("/") if p]
+        rota = partes[0] if partes else ""
+        with medir(f"api.{rota or 'inicio'}", detalhe=self.path):
+            try:
+                if rota == "":
+                    self._json(200, json.dumps({"rotas": [
+                        "/versao", "/graficos", "/graficos/<nome>", "/secoes/<secao>",
+                        "/exportar.csv", "/exportar.ndjson",
+                    ]}))
+                elif rota == "graficos" and len(partes) == 1:
+                    self._json(200, json.dumps({"graficos": list(analise.GRAFICOS), "secoes": analise.SECOES}))
+                elif rota in ("versao", "graficos", "secoes") and len(partes) <= 2:
+                    self._agregacao(rota, partes[1] if len(partes) == 2 else None, parametros)
+                elif rota in ("exportar.csv", "exportar.ndjson") and len(partes) == 1:
+                    self._exportar(rota.split(".")[1], parametros)
+                else:
+                    raise ErroRequisicao(f"Rota não encontrada: {url.path}", status=404)
+            except ErroRequisicao as erro:
+                self._json(erro.status, json.dumps({"erro": str(erro)}, ensure_ascii=False))
+            except ValueError as erro:
+                # Nomes inválidos vindos de analise/crud (gráfico, backend, coluna)
+                self._json(400, json.dumps({"erro": str(erro)}, ensure_ascii=False))
+
+    # ----------------------------
+    # Cache HTTP pela versão dos dados
+    def _versao(self, filtros):
+        """Versão dos dados; responde 304 (e devolve None) se o cliente já a tem."""
+        versao = crud.versao_dados(filtros)
+        etag = f'"v{versao}"'
+        if etag in [e.strip() for e in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        return versao
+
+    def _cabecalhos(self, status, tipo, versao=None):
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        if versao is not None:
+            self.send_header("ETag", f'"v{versao}"')
+            # Pode guardar, mas precisa revalidar (o ETag muda a cada escrita)
+            self.send_header("Cache-Control", "no-cache")
+
+    def _json(self, status, corpo, versao=None):
+        dados = corpo.encode("utf-8")
+        self._cabecalhos(status, "application/json; charset=utf-8", versao)
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    # ----------------------------
+    # Agregações (mesmo motor e cache do app)
+    def _agregacao(self, rota, nome, parametros):
+        filtros = ler_filtros(parametros)
+        if rota == "versao":
+            self._json(200, json.dumps({"versao": crud.versao_dados(filtros)}))
+            return
+        if nome is None:
+            raise ErroRequisicao(f"Informe o nome: /{rota}/<nome>", status=404)
+        if rota == "graficos" and nome not in analise.GRAFICOS:
+            raise ErroRequisicao(f"Gráfico desconhecido: {nome}", status=404)
+        if rota == "secoes" and nome not in analise.SECOES:
+            raise ErroRequisicao(f"Seção desconhecida: {nome}", status=404)
+
+        backend = parametros.get("backend", ["sql"])[0]
+        if backend not in analise.BACKENDS:
+            raise ErroRequisicao(f"Backend desconhecido: {backend} (opções: {', '.join(analise.BACKENDS)})")
+
+        versao = self._versao(filtros)
+        if versao is None:
+            return
+        graficos = [nome] if rota == "graficos" else analise.SECOES[nome]
+        dados = calcular_dashboard(filtros, backend=backend, graficos=graficos)
+        cabecalho = f'"versao": {versao}, "filtros": {json.dumps(filtros, ensure_ascii=False)}'
+        if rota == "graficos":
+            corpo = f'{{"grafico": {json.dumps(nome)}, {cabecalho}, "dados": {_tabela_json(dados[nome])}}}'
+        else:
+            tabelas = ", ".join(f"{json.dumps(g)}: {_tabela_json(dados[g])}" for g in graficos)
+            corpo = f'{{"secao": {json.dumps(nome)}, {cabecalho}, "graficos": {{{tabelas}}}}}'
+        self._json(200, corpo, versao)
+
+    # ----------------------------
+    # Exportação em streaming
+    def _exportar(self, formato, parametros):
+        filtros = ler_filtros(parametros)
+        colunas = _lista(parametros, "colunas") or ["id_consulta", *crud.COLUNAS_INSERCAO]
+        lotes = crud.iterar_consultas(filtros, colunas, LINHAS_POR_LOTE)
+        versao = self._versao(filtros)
+        if versao is None:
+            lotes.close()
+            return
+        # O primeiro lote valida as colunas antes de enviar o status 200
+        primeiro = next(lotes, [])
+
+        tipo = "text/csv; charset=utf-8" if formato == "csv" else "application/x-ndjson; charset=utf-8"
+        self._cabecalhos(200, tipo, versao)
+        self.send_header("Transfer-Encoding", "chunked")
+        if formato == "csv":
+            self.send_header("Content-Disposition", 'attachment; filename="consultas.csv"')
+        self.end_headers()
+
+        def texto(lote):
+            if formato == "ndjson":
+                return "".join(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False) + "\n" for linha in lote)
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator="\n").writerows(lote)
+            return buffer.getvalue()
+
+        try:
+            if formato == "csv":
+                self._pedaco(",".join(colunas) + "\n")
+            if primeiro:
+                self._pedaco(texto(primeiro))
+            for lote in lotes:
+                self._pedaco(texto(lote))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente desistiu no meio: só libera a conexão com o banco
+            self.close_connection = True
+        finally:
+            lotes.close()
+
+    def _pedaco(self, texto):
+        dados = texto.encode("utf-8")
+        self.wfile.write(f"{len(dados):x}\r\n".encode("ascii") + dados + b"\r\n")
+
+def servir(host="127.0.0.1", porta=PORTA_PADRAO):
+    create_table()
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorApi)
+    print(f"API do dashboard em http://{host}:{porta}/")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP/JSON das agregações do dashboard")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    args = parser.parse_args()
+    servir(args.host, args.porta)
@@ -1,14 +1,44 @@
+import os
+import time
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from crud import listar_consultas, inserir_consulta, atualizar_consulta, excluir_consulta, inicializar_banco
+import plotly.graph_objects as go
+import crud
+import analise
+import amostra
+import perfil
+import snapshot
+import fila_escrita
+from crud import inicializar_banco
+from esquema import relatorio_memoria
+from cache import em_cache, cache_consultas
 
 # =========================================================
 # Inicialização do Banco
 # =========================================================
 
-inicializar_banco()
-df = listar_consultas()
+# O toggle do perfil fica no painel de depuração (fim da barra lateral),
+# mas precisa valer desde o início da execução
+if "perfil_ativo" in st.session_state:
+    perfil.perfilador.ativo = st.session_state["perfil_ativo"]
+inicio_execucao = time.perf_counter()
+
+# Executa uma vez por processo, não a cada interação com os widgets
+@st.cache_resource(show_spinner=False)
+def preparar_banco():
+    inicializar_banco()
+
+preparar_banco()
+
+# Leituras com cache: a chave inclui a versão dos dados, que as
+# funções de escrita do crud incrementam
+listar_consultas_paginado = em_cache(crud.listar_consultas_paginado)
+contar_consultas = em_cache(crud.contar_consultas)
+obter_consulta = em_cache(crud.obter_consulta)
+calcular_dashboard = em_cache(analise.calcular_dashboard)
+listar_valores_distintos = em_cache(crud.listar_valores_distintos)
+listar_anos = em_cache(crud.listar_anos)
 
 # =========================================================
 # Configurações da página
@@ -69,326 +99,712 @@ def reverse_map(mapping, value):
             return k
     return value
 
+def indice_opcao(opcoes, valor):
+    """Posição de `valor` em `opcoes` ou None (seleção vazia) se não estiver lá, como um NULL."""
+    opcoes = list(opcoes)
+    return opcoes.index(valor) if valor in opcoes else None
+
+def valor_campo(valor, tipo):
+    """`tipo(valor)` para preencher o formulário; campos NULL ficam em branco."""
+    return None if valor is None else tipo(valor)
+
 
 # =========================================================
 # Filtros laterais
 # =========================================================
 st.sidebar.header("Filtros")
 
-estados = st.sidebar.multiselect("Selecione os estados:", df["estado"].unique())
-especialidades = st.sidebar.multiselect("Selecione as especialidades:", df["especialidade"].unique())
+opcoes_estado = listar_valores_distintos("estado")
+opcoes_especialidade = listar_valores_distintos("especialidade")
+
+estados = st.sidebar.multiselect("Selecione os estados:", opcoes_estado)
+especialidades = st.sidebar.multiselect("Selecione as especialidades:", opcoes_especialidade)
 meses = st.sidebar.multiselect(
     "Selecione os meses:", 
     options=list(range(1, 13)), 
     format_func=lambda x: ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"][x-1]
 )
 
-ano = st.sidebar.multiselect("Selecione os anos:", sorted(df["data_consulta"].dt.year.unique()))
+ano = st.sidebar.multiselect("Selecione os anos:", listar_anos())
+
+# Os filtros são aplicados no SQLite (WHERE parametrizado), não em memória
+filtros = {"estados": estados, "especialidades": especialidades, "meses": meses, "anos": ano}
+
+# =========================================================
+# Visualização: fonte dos dados e seções do dashboard
+# =========================================================
+st.sidebar.header("Visualização")
+
+# Snapshot Parquet: leitura colunar só das partições (ano/mês) filtradas
+fontes = {"SQLite": "sql"}
+if snapshot.snapshot_disponivel():
+    fontes["Snapshot Parquet"] = "parquet"
+# Agregação por ano/mês num pool de processos (só compensa com mais de um núcleo)
+if (os.cpu_count() or 1) > 1:
+    fontes["SQLite em paralelo"] = "paralelo"
+fonte_dados = st.sidebar.selectbox("Fonte dos dados:", list(fontes.keys()))
+backend = fontes[fonte_dados]
+
+# Só as seções escolhidas são calculadas e desenhadas
+SECOES_DASHBOARD = {
+    "volume": "📊 Volume de Consultas ao longo do tempo",
+    "especialidades": "🩺 Distribuição de Especialidades Médicas",
+    "receita": "💰 Receita por Especialidade",
+    "geografia": "🌍 Análise Geográfica",
+    "pacientes": "👨‍👩‍👧 Perfil dos Pacientes",
+    "espera": "⏱️ Tempo de Espera",
+    "satisfacao": "⭐ Satisfação dos Pacientes",
+    "medicacao": "💊 Receita de Medicação",
+}
+secoes = st.sidebar.multiselect(
+    "Seções do dashboard:", list(SECOES_DASHBOARD), default=list(SECOES_DASHBOARD),
+    format_func=SECOES_DASHBOARD.get
+)
+
+# Prévia: primeiro desenha estimativas da amostra estratificada (rápidas),
+# depois troca pelos valores exatos no mesmo lugar
+previa_rapida = st.sidebar.toggle(
+    "Prévia rápida (amostra)",
+    help="Mostra primeiro estimativas a partir de uma amostra estratificada por mês, estado e "
+         "especialidade (com intervalo de confiança de 95%) e as substitui pelos valores exatos "
+         "quando o cálculo termina."
+)
+LEGENDA_PREVIA = "≈ Prévia pela amostra estratificada (barras de erro = IC 95%). Calculando os valores exatos…"
+
+def dados_secao(secao, graficos=None, fonte=None, **opcoes):
+    """
+    Dados dos gráficos de uma seção. O cache é por seção: abrir ou mudar
+    uma seção não recalcula as outras, e uma escrita só invalida as seções
+    cujos filtros cobrem o mês alterado. `fonte="amostra"` dá a prévia.
+    """
+    return calcular_dashboard(
+        filtros, backend=fonte or backend, graficos=graficos or analise.SECOES[secao], **opcoes
+    )
 
-df_filtrado = df.copy()
-if estados:
-    df_filtrado = df_filtrado[df_filtrado["estado"].isin(estados)]
-if especialidades:
-    df_filtrado = df_filtrado[df_filtrado["especialidade"].isin(especialidades)]
-if meses:
-    df_filtrado = df_filtrado[df_filtrado["data_consulta"].dt.month.isin(meses)]
-if ano:
-    df_filtrado = df_filtrado[df_filtrado["data_consulta"].dt.year.isin(ano)]
+def usar_previa(secao, graficos=None, **opcoes):
+    """
+    A prévia só vale a pena se o exato é caro: fora do cache e sem resposta
+    direta do resumo mensal. Com a amostra atrasada (ela é refeita em
+    segundo plano), a seção vai direto ao exato.
+    """
+    graficos = graficos or analise.SECOES[secao]
+    return (
+        previa_rapida
+        and not analise.usa_resumo(graficos, backend)
+        and not calcular_dashboard.em_cache(filtros, backend=backend, graficos=graficos, **opcoes)
+        and amostra.amostra_atualizada()
+    )
 
-aba1, aba2 = st.tabs(["📊 Dashboard", "🗂️ Gestão de Consultas"])
+def erro(df, coluna):
+    """Coluna com a meia largura do IC 95% (só nas estimativas da prévia)."""
+    return f"{coluna}_erro" if f"{coluna}_erro" in df.columns else None
 
 # =========================================================
-# Volume de consultas ao longo do tempo
+# Desenho das seções
 # =========================================================
-with aba1:
-    st.subheader("📊 Volume de Consultas ao longo do tempo")
-    consultas_tempo = df_filtrado.groupby([df_filtrado["data_consulta"].dt.to_period("M"), "status_consulta"]).size().reset_index(name="total_consultas")
-    consultas_tempo["mês"] = consultas_tempo["data_consulta"].astype(str)
+# Cada função recebe os dados da seção (exatos ou da prévia) e desenha os
+# gráficos; com a prévia, os mesmos gráficos são desenhados duas vezes.
+
+def mostrar_grafico(fig, previa=False):
+    if previa:
+        # Título marcado (e diferente do gráfico exato que virá no mesmo lugar)
+        fig.update_layout(title_text=f"≈ {fig.layout.title.text} (prévia)")
+    st.plotly_chart(fig, use_container_width=True)
+
+def desenhar_volume(dados, previa=False):
+    consultas_tempo = dados["consultas_tempo"]
 
     fig1 = px.line(
-        consultas_tempo, x="mês", y="total_consultas", color="status_consulta",
+        consultas_tempo, x="mes", y="consultas", color="status_consulta",
+        error_y=erro(consultas_tempo, "consultas"),
         markers=True, title="Evolução mensal de consultas por status"
     )
     fig1.update_traces(hovertemplate="mês, ano: %{x}<br>Consultas: %{y:.1f}<extra></extra>")
-    st.plotly_chart(fig1, use_container_width=True)
+    mostrar_grafico(fig1, previa)
 
-    # =========================================================
-    # Distribuição de especialidades médicas
-    # =========================================================
-    st.subheader("🩺 Distribuição de Especialidades Médicas")
-    esp = df_filtrado["especialidade"].value_counts().reset_index()
-    esp.columns = ["especialidade", "consultas"]
+def desenhar_especialidades(dados, previa=False):
+    esp = dados["especialidades"]
 
     fig2 = px.bar(
         esp, x="consultas", y="especialidade", orientation="h",
+        error_x=erro(esp, "consultas"),
         title="Consultas por Especialidade",
         text=esp["consultas"].apply(format_number)
     )
     fig2.update_traces(textposition="outside", hovertemplate="Consultas: %{x:.1f}<extra></extra>")
-    st.plotly_chart(fig2, use_container_width=True)
-
-    # =========================================================
-    # Receita por especialidade
-    # =========================================================
-    st.subheader("💰 Receita por Especialidade")
+    mostrar_grafico(fig2, previa)
 
+def desenhar_receita(dados, previa=False):
     # Soma por especialidade
-    receita_esp = df_filtrado.groupby("especialidade")["valor_consulta"].sum().reset_index()
+    receita_esp = dados["receita_especialidade"]
     fig3 = px.bar(
-        receita_esp, x="especialidade", y="valor_consulta",
+        receita_esp, x="especialidade", y="receita",
+        error_y=erro(receita_esp, "receita"),
         title="Receita total por Especialidade",
-        text=receita_esp["valor_consulta"].apply(format_currency)
+        text=receita_esp["receita"].apply(format_currency)
     )
     fig3.update_traces(textposition="outside", hovertemplate="Receita: R$ %{y:.1f}<extra></extra>")
     fig3.update_yaxes(title="Receita (R$)", tickprefix="R$ ")
-    st.plotly_chart(fig3, use_container_width=True)
+    mostrar_grafico(fig3, previa)
 
     # Top 5 especialidades por receita (substitui o antigo Top 10 médicos)
-    top_especialidades = (
-        df_filtrado.groupby("especialidade")["valor_consulta"]
-        .sum()
-        .reset_index()
-        .sort_values(by="valor_consulta", ascending=False)
-        .head(5)
-    )
+    top_especialidades = dados["top5_receita"]
 
     fig_top5 = px.bar(
         top_especialidades,
-        x="valor_consulta",
+        x="receita",
         y="especialidade",
         orientation="h",
+        error_x=erro(top_especialidades, "receita"),
         title="Top 5 Especialidades por Receita",
-        text=top_especialidades["valor_consulta"].apply(format_currency)
+        text=top_especialidades["receita"].apply(format_currency)
     )
     fig_top5.update_traces(textposition="outside", hovertemplate="Receita: R$ %{x:.1f}<extra></extra>")
     fig_top5.update_xaxes(title="Receita (R$)", tickprefix="R$ ")
-    st.plotly_chart(fig_top5, use_container_width=True)
+    mostrar_grafico(fig_top5, previa)
 
-    # =========================================================
-    # Análise geográfica
-    # =========================================================
-    st.subheader("🌍 Análise Geográfica")
-    geo = df_filtrado["estado"].value_counts().reset_index()
-    geo.columns = ["estado", "consultas"]
+def desenhar_geografia(dados, previa=False):
+    geo = dados["geografia"]
 
     fig7 = px.bar(
         geo, x="estado", y="consultas",
+        error_y=erro(geo, "consultas"),
         title="Número de Consultas por Estado",
         text=geo["consultas"].apply(format_number)
     )
     fig7.update_traces(textposition="outside", hovertemplate="Consultas: %{y:.1f}<extra></extra>")
-    st.plotly_chart(fig7, use_container_width=True)
-
-    # =========================================================
-    # Perfil dos Pacientes
-    # =========================================================
-    st.subheader("👨‍👩‍👧 Perfil dos Pacientes")
+    mostrar_grafico(fig7, previa)
 
+def desenhar_pacientes(dados, previa=False):
     # Histograma idade (ajuste no hover)
-    fig8 = px.histogram(df_filtrado, x="idade_paciente", nbins=20, title="Distribuição da Idade dos Pacientes")
+    # Contagem por idade vinda do banco; o histograma só soma as contagens por faixa
+    idades = dados["idades"]
+    fig8 = px.histogram(
+        idades, x="idade_paciente", y="consultas", histfunc="sum",
+        nbins=20, title="Distribuição da Idade dos Pacientes"
+    )
     fig8.update_traces(
         hovertemplate="Idade: %{x:.0f} anos<br>Total: %{y} pessoas<extra></extra>"
     )
     fig8.update_yaxes(title="Total de Pacientes")
     fig8.update_xaxes(title="Idade (anos)")
-    st.plotly_chart(fig8, use_container_width=True)
+    mostrar_grafico(fig8, previa)
 
     # Média idade por especialidade
-    idade_esp = df_filtrado.groupby("especialidade")["idade_paciente"].mean().reset_index()
+    idade_esp = dados["idade_especialidade"]
     fig9 = px.bar(
-        idade_esp, x="especialidade", y="idade_paciente",
+        idade_esp, x="especialidade", y="idade_media",
+        error_y=erro(idade_esp, "idade_media"),
         title="Idade média por Especialidade",
-        text=idade_esp["idade_paciente"].apply(format_number)
+        text=idade_esp["idade_media"].apply(format_number)
     )
     fig9.update_traces(textposition="outside", hovertemplate="Idade média: %{y:.1f}<extra></extra>")
-    st.plotly_chart(fig9, use_container_width=True)
-
-    # =========================================================
-    #  Tempo de espera
-    # =========================================================
-    st.subheader("⏱️ Tempo de Espera")
+    mostrar_grafico(fig9, previa)
 
-    fig11 = px.box(df_filtrado, x="especialidade", y="tempo_espera_min", title="Tempo de espera por Especialidade")
-    fig11.update_traces(hovertemplate="Tempo: %{y:.1f} min<extra></extra>")
-    st.plotly_chart(fig11, use_container_width=True)
+def desenhar_espera(dados, modo_render, visualizacao_correlacao, previa=False):
+    if modo_render == "Completo":
+        espera = dados["espera"]
+        fig11 = px.box(espera, x="especialidade", y="tempo_espera_min", title="Tempo de espera por Especialidade")
+        fig11.update_traces(hovertemplate="Tempo: %{y:.1f} min<extra></extra>")
+    else:
+        # Boxplot a partir dos quartis calculados no servidor
+        espera = dados["espera_resumo"]
+        fig11 = go.Figure(go.Box(
+            x=espera["especialidade"], q1=espera["q1"], median=espera["mediana"], q3=espera["q3"],
+            lowerfence=espera["limite_inferior"], upperfence=espera["limite_superior"],
+            mean=espera["media"], name="Tempo de espera"
+        ))
+        fig11.update_layout(title="Tempo de espera por Especialidade")
+        fig11.update_xaxes(title="especialidade")
+        fig11.update_yaxes(title="tempo_espera_min")
+    mostrar_grafico(fig11, previa)
 
     # Correlação espera x satisfação
-    corr = df_filtrado.dropna(subset=["satisfacao_paciente"])
-    fig12 = px.scatter(
-        corr, x="tempo_espera_min", y="satisfacao_paciente", color="especialidade",
-        title="Correlação entre tempo de espera e satisfação"
-    )
-    fig12.update_traces(hovertemplate="Espera: %{x:.1f} min<br>Satisfação: %{y:.1f}<extra></extra>")
-    st.plotly_chart(fig12, use_container_width=True)
-
-    # =========================================================
-    #  Satisfação dos pacientes
-    # =========================================================
-    st.subheader("⭐ Satisfação dos Pacientes")
-
-    sat_esp = df_filtrado.groupby("especialidade")["satisfacao_paciente"].mean().reset_index()
+    if modo_render == "Completo":
+        corr = dados["correlacao"]
+        fig12 = px.scatter(
+            corr, x="tempo_espera_min", y="satisfacao_paciente", color="especialidade",
+            title="Correlação entre tempo de espera e satisfação"
+        )
+        fig12.update_traces(hovertemplate="Espera: %{x:.1f} min<br>Satisfação: %{y:.1f}<extra></extra>")
+    elif visualizacao_correlacao == "amostra":
+        corr = dados["correlacao_amostra"]
+        fig12 = px.scatter(
+            corr, x="tempo_espera_min", y="satisfacao_paciente", color="especialidade",
+            title=f"Correlação entre tempo de espera e satisfação (amostra de {len(corr)} consultas)"
+        )
+        fig12.update_traces(hovertemplate="Espera: %{x:.1f} min<br>Satisfação: %{y:.1f}<extra></extra>")
+    else:
+        corr = dados["correlacao_densidade"]
+        fig12 = px.density_heatmap(
+            corr, x="tempo_espera_min", y="satisfacao_paciente", z="consultas",
+            histfunc="sum", nbinsx=40, title="Correlação entre tempo de espera e satisfação (densidade)"
+        )
+        fig12.update_traces(hovertemplate="Espera: %{x} min<br>Satisfação: %{y}<br>Consultas: %{z}<extra></extra>")
+    mostrar_grafico(fig12, previa)
+
+    if "correlacao_coeficiente" in dados:
+        coeficiente = dados["correlacao_coeficiente"].iloc[0]
+        st.caption(
+            f"Correlação de Pearson (todas as {coeficiente['consultas']:.0f} consultas com satisfação): "
+            f"r = {coeficiente['pearson']:.3f}"
+        )
+
+def desenhar_satisfacao(dados, previa=False):
+    sat_esp = dados["satisfacao_especialidade"]
     fig13 = px.bar(
-        sat_esp, x="especialidade", y="satisfacao_paciente",
+        sat_esp, x="especialidade", y="satisfacao_media",
+        error_y=erro(sat_esp, "satisfacao_media"),
         title="Satisfação média por Especialidade",
-        text=sat_esp["satisfacao_paciente"].apply(format_number)
+        text=sat_esp["satisfacao_media"].apply(format_number)
     )
     fig13.update_traces(textposition="outside", hovertemplate="Satisfação: %{y:.1f}<extra></extra>")
-    st.plotly_chart(fig13, use_container_width=True)
+    mostrar_grafico(fig13, previa)
 
-    sat_sexo = df_filtrado.groupby("sexo_paciente")["satisfacao_paciente"].mean().reset_index()
+    sat_sexo = dados["satisfacao_sexo"]
     fig14 = px.bar(
-        sat_sexo, x="sexo_paciente", y="satisfacao_paciente",
+        sat_sexo, x="sexo_paciente", y="satisfacao_media",
+        error_y=erro(sat_sexo, "satisfacao_media"),
         title="Satisfação média por Sexo",
-        text=sat_sexo["satisfacao_paciente"].apply(format_number)
+        text=sat_sexo["satisfacao_media"].apply(format_number)
     )
     fig14.update_traces(textposition="outside", hovertemplate="Satisfação: %{y:.1f}<extra></extra>")
-    st.plotly_chart(fig14, use_container_width=True)
+    mostrar_grafico(fig14, previa)
 
-    sat_estado = df_filtrado.groupby("estado")["satisfacao_paciente"].mean().reset_index()
+    sat_estado = dados["satisfacao_estado"]
     fig15 = px.bar(
-        sat_estado, x="estado", y="satisfacao_paciente",
+        sat_estado, x="estado", y="satisfacao_media",
+        error_y=erro(sat_estado, "satisfacao_media"),
         title="Satisfação média por Estado",
-        text=sat_estado["satisfacao_paciente"].apply(format_number)
+        text=sat_estado["satisfacao_media"].apply(format_number)
     )
     fig15.update_traces(textposition="outside", hovertemplate="Satisfação: %{y:.1f}<extra></extra>")
-    st.plotly_chart(fig15, use_container_width=True)
+    mostrar_grafico(fig15, previa)
 
-    # =========================================================
-    #  Receita de medicação
-    # =========================================================
-    st.subheader("💊 Receita de Medicação")
+def desenhar_medicacao(dados, previa=False):
+    receita_percentual = dados["receita_percentual"]
 
-    receita_percentual = df_filtrado["receita_medicacao"].value_counts(normalize=True).reset_index()
-    receita_percentual.columns = ["receita_medicacao", "percentual"]
-
-    fig16 = px.pie(receita_percentual, names="receita_medicacao", values="percentual", title="Percentual de Consultas com Receita")
+    fig16 = px.pie(receita_percentual, names="receita_medicacao", values="consultas", title="Percentual de Consultas com Receita")
     fig16.update_traces(textinfo="label+percent", hovertemplate="%{label}: %{percent:.1%}<extra></extra>")
-    st.plotly_chart(fig16, use_container_width=True)
+    mostrar_grafico(fig16, previa)
 
-    receita_esp = df_filtrado[df_filtrado["receita_medicacao"] == "Sim"].groupby("especialidade").size().reset_index(name="receitas")
+    receita_esp = dados["receitas_especialidade"]
     fig17 = px.bar(
         receita_esp, x="especialidade", y="receitas",
+        error_y=erro(receita_esp, "receitas"),
         title="Receitas de Medicação por Especialidade",
         text=receita_esp["receitas"].apply(format_number)
     )
     fig17.update_traces(textposition="outside", hovertemplate="Receitas: %{y:.1f}<extra></extra>")
-    st.plotly_chart(fig17, use_container_width=True)
+    mostrar_grafico(fig17, previa)
 
-    receita_estado = df_filtrado[df_filtrado["receita_medicacao"] == "Sim"].groupby("estado").size().reset_index(name="receitas")
+    receita_estado = dados["receitas_estado"]
     fig18 = px.bar(
         receita_estado, x="estado", y="receitas",
+        error_y=erro(receita_estado, "receitas"),
         title="Receitas de Medicação por Estado",
         text=receita_estado["receitas"].apply(format_number)
     )
     fig18.update_traces(textposition="outside", hovertemplate="Receitas: %{y:.1f}<extra></extra>")
-    st.plotly_chart(fig18, use_container_width=True)
+    mostrar_grafico(fig18, previa)
+
+DESENHOS = {
+    "volume": desenhar_volume,
+    "especialidades": desenhar_especialidades,
+    "receita": desenhar_receita,
+    "geografia": desenhar_geografia,
+    "pacientes": desenhar_pacientes,
+    "satisfacao": desenhar_satisfacao,
+    "medicacao": desenhar_medicacao,
+}
+
+# =========================================================
+# Tempo de espera (fragmento)
+# =========================================================
+# As opções de visualização ficam dentro da seção: mudá-las reexecuta só
+# este fragmento, não o dashboard inteiro.
+@st.fragment
+def secao_espera():
+    col_modo, col_correlacao, col_amostra = st.columns(3)
+    modo_render = col_modo.radio(
+        "Tempo de espera e correlação:", ["Resumido", "Completo"], horizontal=True,
+        help="Resumido envia ao navegador só estatísticas (quartis, densidade ou amostra); "
+             "Completo envia todas as consultas filtradas."
+    )
+    visualizacao_correlacao = "densidade"
+    limite_amostra = analise.LIMITE_AMOSTRA
+    if modo_render == "Resumido":
+        visualizacao_correlacao = col_correlacao.radio(
+            "Correlação como:", ["Densidade", "Amostra"], horizontal=True
+        ).lower()
+        if visualizacao_correlacao == "amostra":
+            limite_amostra = col_amostra.slider(
+                "Tamanho máximo da amostra:", 500, 50_000, analise.LIMITE_AMOSTRA, step=500
+            )
+    graficos = [
+        g for g in analise.graficos_do_modo(modo_render.lower(), visualizacao_correlacao)
+        if g in analise.SECOES["espera"]
+    ]
+
+    espaco = st.empty()
+    if usar_previa("espera", graficos, limite_amostra=limite_amostra):
+        with perfil.medir("app.previa.espera"), espaco.container():
+            st.caption(LEGENDA_PREVIA)
+            dados = dados_secao("espera", graficos, fonte="amostra", limite_amostra=limite_amostra)
+            desenhar_espera(dados, modo_render, visualizacao_correlacao, previa=True)
+    with perfil.medir("app.secao.espera"):
+        dados = dados_secao("espera", graficos, limite_amostra=limite_amostra)
+        with espaco.container():
+            st.empty()  # lugar da legenda da prévia
+            desenhar_espera(dados, modo_render, visualizacao_correlacao)
+
+# =========================================================
+# Escritas dos formulários (fila em segundo plano)
+# =========================================================
+# Os formulários gravam pela fila_escrita em callbacks: o envio devolve na
+# hora um ID de escrita, guardado na sessão, e a gravação acontece na
+# thread escritora (em grupo com as escritas de outras sessões). Antes de
+# ler, a sessão espera as próprias escritas pendentes (até PRAZO_LEITURA),
+# então sempre vê o que acabou de gravar sem precisar de st.rerun().
+PRAZO_LEITURA = 2.0
+
+def enviar_escrita(operacao, item, descricao):
+    try:
+        id_escrita = fila_escrita.enviar(operacao, item)
+    except RuntimeError as erro:
+        st.session_state["erro_escrita"] = str(erro)
+        return
+    st.session_state.setdefault("escritas", []).append({"id": id_escrita, "descricao": descricao})
+
+def escritas_pendentes():
+    """IDs das escritas desta sessão que ainda estão na fila."""
+    return [
+        escrita["id"] for escrita in st.session_state.get("escritas", [])
+        if (fila_escrita.status(escrita["id"]) or {}).get("estado") == fila_escrita.PENDENTE
+    ]
+
+def enviar_cadastro():
+    campo = st.session_state
+    enviar_escrita("inserir", (
+        campo["cad_paciente"], campo["cad_medico"], str(campo["cad_data"]), campo["cad_estado"], campo["cad_cidade"],
+        campo["cad_especialidade"], campo["cad_idade"], map_sexo[campo["cad_sexo"]], campo["cad_valor"],
+        map_pagamento[campo["cad_pagamento"]], campo["cad_espera"], campo["cad_satisfacao"],
+        map_receita[campo["cad_receita"]], map_status[campo["cad_status"]]
+    ), "Cadastro da consulta")
+
+def enviar_atualizacao(id_consulta):
+    # Os campos do formulário de atualização têm o ID na chave (mudar o ID recarrega o formulário)
+    def campo(nome):
+        return st.session_state[f"upd_{nome}_{id_consulta}"]
+    enviar_escrita("atualizar", (id_consulta, (
+        campo("paciente"), campo("medico"), campo("data"), campo("estado"), campo("cidade"),
+        campo("especialidade"), campo("idade"), map_sexo.get(campo("sexo")), campo("valor"),
+        map_pagamento.get(campo("pagamento")), campo("espera"), campo("satisfacao"),
+        map_receita.get(campo("receita")), map_status.get(campo("status"))
+    )), f"Atualização da consulta {id_consulta}")
+
+def enviar_exclusao(id_consulta):
+    if not st.session_state.get("confirm_delete"):
+        st.session_state["erro_escrita"] = "⚠️ Confirme a exclusão antes de prosseguir."
+        return
+    st.session_state["confirm_delete"] = False
+    enviar_escrita("excluir", id_consulta, f"Exclusão da consulta {id_consulta}")
+
+@st.fragment(run_every=1)
+def acompanhar_escritas():
+    """Enquanto houver escritas da sessão na fila, confere a cada segundo e recarrega ao terminar."""
+    pendentes = escritas_pendentes()
+    if not pendentes:
+        st.rerun()
+    st.info(f"⏳ {len(pendentes)} escrita(s) na fila (#{', #'.join(map(str, pendentes))}); "
+            "os dados serão atualizados quando forem gravadas.")
+
+# Só a aba escolhida é executada (com st.tabs as duas rodariam a cada rerun)
+ABAS = ["📊 Dashboard", "🗂️ Gestão de Consultas"]
+aba = st.radio("Aba:", ABAS, horizontal=True, label_visibility="collapsed", key="aba")
+
+# Leitura das próprias escritas: espera as pendentes desta sessão antes de ler
+gravacao_atrasada = not fila_escrita.aguardar(escritas_pendentes(), PRAZO_LEITURA)
+
+if aba == ABAS[0]:
+    if not secoes:
+        st.info("Selecione ao menos uma seção do dashboard na barra lateral.")
+
+    # Um espaço por seção, na ordem da barra lateral; cada um é preenchido
+    # pela prévia (se ligada) e depois substituído pelos valores exatos. O
+    # tempo de espera é um fragmento e faz as duas etapas por conta própria.
+    # A etapa exata desenha o mesmo número de elementos da prévia (a legenda
+    # vira um st.empty): o Streamlit reaproveita os filhos do contêiner e um
+    # elemento a mais da prévia ficaria na tela ao lado dos gráficos exatos.
+    espacos = {}
+    for secao in secoes:
+        st.subheader(SECOES_DASHBOARD[secao])
+        espacos[secao] = st.container() if secao == "espera" else st.empty()
+
+    for secao, espaco in espacos.items():
+        if secao != "espera" and usar_previa(secao):
+            with perfil.medir(f"app.previa.{secao}"), espaco.container():
+                st.caption(LEGENDA_PREVIA)
+                DESENHOS[secao](dados_secao(secao, fonte="amostra"), previa=True)
+
+    for secao, espaco in espacos.items():
+        if secao == "espera":
+            with espaco:
+                secao_espera()
+            continue
+        with perfil.medir(f"app.secao.{secao}"):
+            dados = dados_secao(secao)
+            with espaco.container():
+                st.empty()  # lugar da legenda da prévia
+                DESENHOS[secao](dados)
+
 
 # =========================================================
 # CRUD - Gestão de Consultas
 # =========================================================
 
-with aba2:
+if aba == ABAS[1]:
     st.header("🗂️ Gestão de Consultas (CRUD)")
 
+    # Resultado das escritas enviadas pelos formulários desta sessão
+    erro_escrita = st.session_state.pop("erro_escrita", None)
+    if erro_escrita:
+        st.warning(erro_escrita)
+    restantes = []
+    for escrita in st.session_state.get("escritas", []):
+        estado = fila_escrita.status(escrita["id"]) or {"estado": fila_escrita.FALHOU, "erro": "estado perdido"}
+        if estado["estado"] == fila_escrita.PENDENTE:
+            restantes.append(escrita)
+        elif estado["estado"] == fila_escrita.GRAVADA:
+            st.success(f"✅ {escrita['descricao']}: gravada (escrita #{escrita['id']}).")
+        else:
+            st.error(f"❌ {escrita['descricao']}: falhou (escrita #{escrita['id']}): {estado['erro']}")
+    st.session_state["escritas"] = restantes
+    if gravacao_atrasada:
+        acompanhar_escritas()
+
     # ----------------------------
     # 1. Cadastro
     with st.expander("➕ Cadastrar nova consulta"):
         with st.form("form_cadastro", clear_on_submit=False):
-            id_paciente = st.number_input("ID do paciente:", min_value=1001, step=1)
-            id_medico = st.number_input("ID do médico:", min_value=1, step=1)
-            data = st.date_input("Data da consulta")
-            estado = st.selectbox("Estado", df["estado"].unique())
-            cidade = st.text_input("Cidade")
-            especialidade = st.selectbox("Especialidade", df["especialidade"].unique())
-            idade = st.number_input("Idade do paciente", min_value=0, max_value=120)
-            sexo = st.selectbox("Sexo do paciente", list(map_sexo.keys()))
-            valor = st.number_input("Valor da consulta (R$)", min_value=0.0, step=50.0)
-            forma_pagamento = st.selectbox("Forma de pagamento", list(map_pagamento.keys()))
-            tempo_espera = st.number_input("Tempo de espera (min)", min_value=0, step=1)
-            satisfacao = st.slider("Satisfação do paciente (0 a 5)", 0, 5, 1)
-            receita = st.selectbox("Receita de medicação", list(map_receita.keys()))
-            status = st.selectbox("Status da consulta", list(map_status.keys()))
-
-            cadastrar = st.form_submit_button("Salvar", use_container_width=True)
-
-        if cadastrar:
-            inserir_consulta((
-                id_paciente, id_medico, str(data), estado, cidade,
-                especialidade, idade, map_sexo[sexo], valor, map_pagamento[forma_pagamento],
-                tempo_espera, satisfacao, map_receita[receita], map_status[status]
-            ))
-            st.success("✅ Consulta cadastrada com sucesso!")
-            st.rerun()
+            st.number_input("ID do paciente:", min_value=1001, step=1, key="cad_paciente")
+            st.number_input("ID do médico:", min_value=1, step=1, key="cad_medico")
+            st.date_input("Data da consulta", key="cad_data")
+            st.selectbox("Estado", opcoes_estado, key="cad_estado")
+            st.text_input("Cidade", key="cad_cidade")
+            st.selectbox("Especialidade", opcoes_especialidade, key="cad_especialidade")
+            st.number_input("Idade do paciente", min_value=0, max_value=120, key="cad_idade")
+            st.selectbox("Sexo do paciente", list(map_sexo.keys()), key="cad_sexo")
+            st.number_input("Valor da consulta (R$)", min_value=0.0, step=50.0, key="cad_valor")
+            st.selectbox("Forma de pagamento", list(map_pagamento.keys()), key="cad_pagamento")
+            st.number_input("Tempo de espera (min)", min_value=0, step=1, key="cad_espera")
+            st.slider("Satisfação do paciente (0 a 5)", 0, 5, 1, key="cad_satisfacao")
+            st.selectbox("Receita de medicação", list(map_receita.keys()), key="cad_receita")
+            st.selectbox("Status da consulta", list(map_status.keys()), key="cad_status")
+
+            st.form_submit_button("Salvar", use_container_width=True, on_click=enviar_cadastro)
 
     # ----------------------------
-    # 2. Visualizar
-    st.subheader("📋 Consultas registradas")
-    st.dataframe(df)
+    # 2. Visualizar (fragmento: busca e paginação reexecutam só a tabela)
+    @st.fragment
+    def tabela_consultas():
+        st.subheader("📋 Consultas registradas")
+
+        col_busca, col_ordem, col_direcao, col_tamanho = st.columns([3, 2, 1, 1])
+        busca = col_busca.text_input("Buscar (cidade, estado, especialidade, status ou ID):")
+        ordenar_por = col_ordem.selectbox("Ordenar por:", list(crud.COLUNAS_ORDENAVEIS.keys()))
+        decrescente = col_direcao.toggle("Decrescente")
+        tamanho_pagina = col_tamanho.selectbox("Por página:", [25, 50, 100, 250], index=1)
+
+        # Pilha de cursores (keyset) das páginas visitadas; reinicia se a busca mudar
+        parametros_pagina = (busca, ordenar_por, decrescente, tamanho_pagina)
+        if st.session_state.get("pagina_parametros") != parametros_pagina:
+            st.session_state["pagina_parametros"] = parametros_pagina
+            st.session_state["pagina_cursores"] = [None]
+        cursores = st.session_state["pagina_cursores"]
+
+        pagina, proximo_cursor = listar_consultas_paginado(
+            limite=tamanho_pagina, ordenar_por=ordenar_por, decrescente=decrescente,
+            apos=cursores[-1], busca=busca
+        )
+        total_consultas = contar_consultas(busca=busca)
+        st.dataframe(pagina, hide_index=True)
+
+        # Os botões mudam a pilha em callbacks, antes da próxima execução do fragmento
+        col_anterior, col_info, col_proxima = st.columns([1, 2, 1])
+        col_anterior.button("◀ Anterior", disabled=len(cursores) == 1, use_container_width=True,
+                            on_click=cursores.pop)
+        col_info.caption(f"Página {len(cursores)} · {total_consultas} consultas encontradas")
+        col_proxima.button("Próxima ▶", disabled=proximo_cursor is None, use_container_width=True,
+                           on_click=cursores.append, args=(proximo_cursor,))
+
+        # Sugestão de ID para os formulários de atualização e exclusão
+        st.session_state["id_sugerido"] = int(pagina["id_consulta"].iloc[0]) if not pagina.empty else 1
+
+    tabela_consultas()
+    id_sugerido = st.session_state.get("id_sugerido", 1)
 
     # ----------------------------
     # 3. Atualizar
     with st.expander("✏️ Atualizar consulta"):
-        if not df.empty:
-            id_update = st.selectbox("Escolha a consulta pelo ID:", df["id_consulta"].tolist(), key="update")
-            registro = df[df["id_consulta"] == int(id_update)].iloc[0]
+        id_update = st.number_input("ID da consulta:", min_value=1, step=1, value=id_sugerido, key="update")
+        registro = obter_consulta(id_update)
 
+        if registro is None:
+            st.warning(f"⚠️ Consulta {id_update} não encontrada.")
+        else:
             with st.form("form_update", clear_on_submit=False):
-                novo_paciente = st.number_input("ID do paciente", value=int(registro["id_paciente"]))
-                novo_medico = st.number_input("ID do médico", value=int(registro["id_medico"]))
-                nova_data = st.date_input("Data da consulta", registro["data_consulta"].date())
-                novo_estado = st.selectbox("Estado", df["estado"].unique(), index=list(df["estado"].unique()).index(registro["estado"]))
-                nova_cidade = st.text_input("Cidade", registro["cidade"])
-                nova_especialidade = st.selectbox("Especialidade", df["especialidade"].unique(), index=list(df["especialidade"].unique()).index(registro["especialidade"]))
-                nova_idade = st.number_input("Idade do paciente", value=int(registro["idade_paciente"]))
-                novo_sexo = st.selectbox("Sexo", list(map_sexo.keys()),
-                                         index=list(map_sexo.values()).index(registro["sexo_paciente"]))
-                novo_valor = st.number_input("Valor", value=float(registro["valor_consulta"]))
-                nova_forma = st.selectbox("Forma de pagamento", list(map_pagamento.keys()),
-                                          index=list(map_pagamento.values()).index(registro["forma_pagamento"]))
-                novo_tempo = st.number_input("Tempo de espera (min)", value=int(registro["tempo_espera_min"]))
-                nova_satisfacao = st.slider("Satisfação", 0, 5, int(registro["satisfacao_paciente"]) if pd.notna(registro["satisfacao_paciente"]) else 5)
-                nova_receita = st.selectbox("Receita de medicação", list(map_receita.keys()),
-                                            index=list(map_receita.values()).index(registro["receita_medicacao"]))
-                novo_status = st.selectbox("Status", list(map_status.keys()),
-                                           index=list(map_status.values()).index(registro["status_consulta"]))
-
-                atualizar = st.form_submit_button("Atualizar", use_container_width=True)
-
-            if atualizar:
-                atualizar_consulta(int(id_update), (
-                    novo_paciente, novo_medico, str(nova_data), novo_estado, nova_cidade,
-                    nova_especialidade, nova_idade, map_sexo[novo_sexo], novo_valor, map_pagamento[nova_forma],
-                    novo_tempo, nova_satisfacao, map_receita[nova_receita], map_status[novo_status]
-                ))
-                st.success(f"✅ Consulta {id_update} atualizada!")
-                st.rerun()
+                chave = f"_{id_update}"
+                st.number_input("ID do paciente", value=valor_campo(registro["id_paciente"], int), key="upd_paciente" + chave)
+                st.number_input("ID do médico", value=valor_campo(registro["id_medico"], int), key="upd_medico" + chave)
+                st.date_input("Data da consulta", valor_campo(registro["data_consulta"], lambda data: pd.to_datetime(data).date()), key="upd_data" + chave)
+                st.selectbox("Estado", opcoes_estado, index=indice_opcao(opcoes_estado, registro["estado"]), key="upd_estado" + chave)
+                st.text_input("Cidade", registro["cidade"], key="upd_cidade" + chave)
+                st.selectbox("Especialidade", opcoes_especialidade, index=indice_opcao(opcoes_especialidade, registro["especialidade"]),
+                             key="upd_especialidade" + chave)
+                st.number_input("Idade do paciente", value=valor_campo(registro["idade_paciente"], int), key="upd_idade" + chave)
+                st.selectbox("Sexo", list(map_sexo.keys()),
+                             index=indice_opcao(map_sexo.values(), registro["sexo_paciente"]), key="upd_sexo" + chave)
+                st.number_input("Valor", value=valor_campo(registro["valor_consulta"], float), key="upd_valor" + chave)
+                st.selectbox("Forma de pagamento", list(map_pagamento.keys()),
+                             index=indice_opcao(map_pagamento.values(), registro["forma_pagamento"]), key="upd_pagamento" + chave)
+                st.number_input("Tempo de espera (min)", value=valor_campo(registro["tempo_espera_min"], int), key="upd_espera" + chave)
+                st.slider("Satisfação", 0, 5, int(registro["satisfacao_paciente"]) if pd.notna(registro["satisfacao_paciente"]) else 5,
+                          key="upd_satisfacao" + chave)
+                st.selectbox("Receita de medicação", list(map_receita.keys()),
+                             index=indice_opcao(map_receita.values(), registro["receita_medicacao"]), key="upd_receita" + chave)
+                st.selectbox("Status", list(map_status.keys()),
+                             index=indice_opcao(map_status.values(), registro["status_consulta"]), key="upd_status" + chave)
+
+                st.form_submit_button("Atualizar", use_container_width=True,
+                                      on_click=enviar_atualizacao, args=(int(id_update),))
 
     # ----------------------------
     # 4. Excluir
     with st.expander("🗑️ Excluir consulta"):
-        if not df.empty:
-            id_delete = st.selectbox("Escolha a consulta pelo ID:", df["id_consulta"].tolist(), key="delete")
-
-            if id_delete:
-                registro = df[df["id_consulta"] == int(id_delete)].iloc[0]
-                st.info(f"""
-                Consulta selecionada:
-                • Paciente: {registro['id_paciente']}
-                • Cidade: {registro['cidade']} - {registro['estado']}
-                • Especialidade: {registro['especialidade']}
-                • Sexo: {reverse_map(map_sexo, registro['sexo_paciente'])}
-                • Forma de Pagamento: {reverse_map(map_pagamento, registro['forma_pagamento'])}
-                • Status: {reverse_map(map_status, registro['status_consulta'])}
-                • Receita: {reverse_map(map_receita, registro['receita_medicacao'])}
-                • Satisfação: {registro['satisfacao_paciente']}
-                """)
-
-                confirmar = st.checkbox("✅ Confirmo exclusão", key="confirm_delete")
-
-                if st.button("Excluir", use_container_width=True, key="btn_excluir"):
-                    if confirmar:
-                        excluir_consulta(int(id_delete))
-                        st.success(f"✅ Consulta {id_delete} excluída!")
-                        st.rerun()
-                    else:
-                        st.warning("⚠️ Confirme a exclusão antes de prosseguir.")
+        id_delete = st.number_input("ID da consulta:", min_value=1, step=1, value=id_sugerido, key="delete")
+        registro = obter_consulta(id_delete)
+
+        if registro is None:
+            st.warning(f"⚠️ Consulta {id_delete} não encontrada.")
+        else:
+            st.info(f"""
+            Consulta selecionada:
+            • Paciente: {registro['id_paciente']}
+            • Cidade: {registro['cidade']} - {registro['estado']}
+            • Especialidade: {registro['especialidade']}
+            • Sexo: {reverse_map(map_sexo, registro['sexo_paciente'])}
+            • Forma de Pagamento: {reverse_map(map_pagamento, registro['forma_pagamento'])}
+            • Status: {reverse_map(map_status, registro['status_consulta'])}
+            • Receita: {reverse_map(map_receita, registro['receita_medicacao'])}
+            • Satisfação: {registro['satisfacao_paciente']}
+            """)
+
+            st.checkbox("✅ Confirmo exclusão", key="confirm_delete")
+            st.button("Excluir", use_container_width=True, key="btn_excluir",
+                      on_click=enviar_exclusao, args=(int(id_delete),))
+
+    # ----------------------------
+    # 5. Operações em lote
+    with st.expander("📤 Importar planilha (CSV/Excel)"):
+        st.caption(f"Colunas esperadas: {', '.join(crud.COLUNAS_INSERCAO)} (e id_consulta para atualizar).")
+        arquivo = st.file_uploader("Arquivo", type=["csv", "xlsx"], key="arquivo_lote")
+        operacao_lote = st.radio("Operação", ["Inserir novas consultas", "Atualizar pelo id_consulta"], horizontal=True)
+        ignorar_invalidas = st.checkbox("Ignorar linhas inválidas (senão nada é gravado se alguma falhar)")
+
+        if arquivo is not None and st.button("Processar planilha", use_container_width=True):
+            try:
+                if arquivo.name.endswith(".xlsx"):
+                    planilha = pd.read_excel(arquivo)
+                else:
+                    planilha = pd.read_csv(arquivo)
+                ids_planilha, linhas = crud.preparar_planilha(planilha)
+            except ImportError:
+                st.error("❌ Leitura de Excel requer o pacote openpyxl.")
+            except ValueError as erro:
+                st.error(f"❌ {erro}")
+            else:
+                if operacao_lote.startswith("Inserir"):
+                    resultado = crud.inserir_consultas(linhas, tudo_ou_nada=not ignorar_invalidas)
+                elif ids_planilha is None:
+                    resultado = {"sucesso": 0, "falhas": [(None, "planilha sem a coluna id_consulta")]}
+                else:
+                    resultado = crud.atualizar_consultas(list(zip(ids_planilha, linhas)), tudo_ou_nada=not ignorar_invalidas)
+                st.session_state["resultado_lote"] = resultado
+                st.rerun()
+
+    with st.expander("🧹 Excluir em lote"):
+        ids_texto = st.text_input("IDs das consultas (separados por vírgula):")
+        excluir_filtradas = st.checkbox("Excluir todas as consultas dos filtros da barra lateral")
+        confirmar_lote = st.checkbox("✅ Confirmo exclusão em lote", key="confirm_delete_lote")
+
+        if st.button("Excluir em lote", use_container_width=True, key="btn_excluir_lote"):
+            if not confirmar_lote:
+                st.warning("⚠️ Confirme a exclusão antes de prosseguir.")
+            elif excluir_filtradas:
+                try:
+                    excluidas = crud.excluir_consultas_por_filtro(filtros)
+                except ValueError as erro:
+                    st.error(f"❌ {erro}")
+                else:
+                    st.session_state["resultado_lote"] = {"sucesso": excluidas, "falhas": []}
+                    st.rerun()
+            else:
+                ids_lote = [int(i) for i in ids_texto.replace(";", ",").split(",") if i.strip().isdigit()]
+                st.session_state["resultado_lote"] = crud.excluir_consultas(ids_lote, tudo_ou_nada=False)
+                st.rerun()
+
+    # Resultado da última operação em lote (sobrevive ao st.rerun)
+    resultado_lote = st.session_state.pop("resultado_lote", None)
+    if resultado_lote is not None:
+        if resultado_lote["sucesso"]:
+            st.success(f"✅ {resultado_lote['sucesso']} consultas processadas.")
+        if resultado_lote["falhas"]:
+            st.error(f"❌ {len(resultado_lote['falhas'])} linhas com erro.")
+            st.dataframe(pd.DataFrame(resultado_lote["falhas"], columns=["linha", "erro"]), hide_index=True)
+
+# =========================================================
+# Estatísticas do cache
+# =========================================================
+with st.sidebar.expander("⚡ Cache"):
+    stats = cache_consultas.estatisticas()
+    st.caption(
+        f"Acertos: {stats['acertos']} · Falhas: {stats['falhas']} · "
+        f"Taxa: {stats['taxa_acerto']:.0%} · Itens: {stats['itens']}/{stats['capacidade']}"
+    )
+
+# =========================================================
+# Depuração: perfil de tempo
+# =========================================================
+with st.sidebar.expander("🐞 Depuração"):
+    st.toggle(
+        "Medir tempos", value=perfil.perfilador.ativo, key="perfil_ativo",
+        help="Mede funções do crud, comandos SQL e blocos de gráficos. Vale para o "
+             "processo inteiro; desligado, o custo é praticamente zero."
+    )
+    # Sob demanda: carrega a tabela inteira, como os backends pandas/Parquet
+    if st.button("Memória do DataFrame", use_container_width=True,
+                 help="Consumo da tabela de consultas em memória, antes e depois da tipagem compacta"):
+        st.caption(f"Consultas em memória: {relatorio_memoria(crud.listar_consultas())}")
+    if perfil.perfilador.ativo:
+        duracao_execucao = time.perf_counter() - inicio_execucao
+        perfil.perfilador.registrar("app.execucao", inicio_execucao, duracao_execucao)
+
+        st.caption(f"Última execução: {duracao_execucao * 1000:.0f} ms")
+        ultima = pd.DataFrame(
+            [(nome, duracao * 1000, linhas) for nome, _, duracao, linhas, _, _
+             in perfil.perfilador.eventos_recentes(inicio_execucao)],
+            columns=["secao", "ms", "linhas"]
+        )
+        st.dataframe(ultima, hide_index=True)
+
+        st.caption(f"Acumulado (últimas {perfil.perfilador.janela} medições por seção)")
+        st.dataframe(pd.DataFrame(perfil.perfilador.resumo()).round(1), hide_index=True)
+
+        col_exportar, col_limpar = st.columns(2)
+        if col_exportar.button("Exportar trace", use_container_width=True):
+            eventos = perfil.perfilador.exportar()
+            st.caption(f"{eventos} eventos gravados em {perfil.ARQUIVO_TRACE} (chrome://tracing)")
+        if col_limpar.button("Limpar", use_container_width=True):
+            perfil.perfilador.limpar()
+            st.rerun()
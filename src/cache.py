@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from crud import versao_dados
+
+# =========================================================
+# Cache LRU das leituras do dashboard
+# =========================================================
+# As chaves incluem a versão dos dados (crud.versao_dados), que as funções
+# de escrita incrementam. Uma escrita em um mês só muda a versão das
+# consultas que cobrem aquele mês; as demais entradas continuam válidas.
+# Os valores devolvidos são compartilhados: não altere os DataFrames.
+
+class CacheLRU:
+    def __init__(self, capacidade=256):
+        self.capacidade = capacidade
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, calcular):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave]
+            self.falhas += 1
+
+        # Calcula fora do lock para não serializar as sessões
+        valor = calcular()
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+        return valor
+
+    def contem(self, chave):
+        with self._lock:
+            return chave in self._itens
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": self.acertos / total if total else 0.0,
+                "itens": len(self._itens),
+                "capacidade": self.capacidade,
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.acertos = 0
+            self.falhas = 0
+
+cache_consultas = CacheLRU()
+
+def _congelar(valor):
+    """Transforma listas/dicionários dos filtros em algo que sirva de chave."""
+    if isinstance(valor, dict):
+        return tuple(sorted((k, _congelar(v)) for k, v in valor.items()))
+    if isinstance(valor, (set, frozenset)):
+        return tuple(sorted(_congelar(v) for v in valor))
+    if isinstance(valor, (list, tuple)):
+        return tuple(_congelar(v) for v in valor)
+    return valor
+
+def _chave(func, args, kwargs):
+    filtros = kwargs.get("filtros")
+    if filtros is None and args and isinstance(args[0], dict):
+        filtros = args[0]
+    return (func.__name__, versao_dados(filtros), _congelar(args), _congelar(kwargs))
+
+def em_cache(func, cache=cache_consultas):
+    """
+    Envolve uma função de leitura do crud com o cache.
+
+    Os filtros (argumento `filtros` ou primeiro argumento posicional, se for
+    um dicionário) definem qual versão dos dados compõe a chave.
+    """
+    @wraps(func)
+    def envolvida(*args, **kwargs):
+        return cache.obter(_chave(func, args, kwargs), lambda: func(*args, **kwargs))
+
+    def em_cache_para(*args, **kwargs):
+        """Indica se a chamada com esses argumentos já está no cache (sem calcular)."""
+        return cache.contem(_chave(func, args, kwargs))
+
+    envolvida.em_cache = em_cache_para
+    return envolvida
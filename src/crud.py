@@ -1,98 +1,832 @@
+import csv
+import hashlib
+import io
+import numbers
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+from itertools import islice
 import pandas as pd
-from database import create_connection, create_table
+from esquema import aplicar_esquema, tipos_csv
+from perfil import cronometrar, medir
+from database import (
+    acumular_resumo, conexao, create_connection, create_table,
+    criar_gatilhos_resumo, remover_gatilhos_resumo
+)
 
 # =========================================================
 # Operações CRUD
 # =========================================================
-def listar_consultas():
-    conn = create_connection()
-    df = pd.read_sql_query("SELECT * FROM consultas", conn)
-    conn.close()
+@cronometrar
+def listar_consultas(tipado=True):
+    """
+    Tabela inteira em um DataFrame. Com `tipado`, aplica o esquema compacto
+    (categorias e inteiros reduzidos); o consumo antes/depois fica em
+    df.attrs["memoria"].
+    """
+    with conexao(somente_leitura=True) as conn:
+        df = pd.read_sql_query(f"SELECT id_consulta, {', '.join(COLUNAS_INSERCAO)} FROM consultas", conn)
+    if tipado:
+        return aplicar_esquema(df)
     df["data_consulta"] = pd.to_datetime(df["data_consulta"], errors="coerce")
     return df
 
+@cronometrar
 def inserir_consulta(dados):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-    INSERT INTO consultas (
-        id_paciente, id_medico, data_consulta, estado, cidade,
-        especialidade, idade_paciente, sexo_paciente, valor_consulta,
-        forma_pagamento, tempo_espera_min, satisfacao_paciente,
-        receita_medicacao, status_consulta
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, dados)
-    conn.commit()
-    conn.close()
+    # Mesma validação dos lotes: data fora de AAAA-MM-DD quebraria o ano_mes
+    with conexao() as conn:
+        _registrar_alteracao(conn, _inserir_uma(conn, dados))
 
+@cronometrar
 def atualizar_consulta(id_consulta, dados):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-    UPDATE consultas SET
-        id_paciente=?, id_medico=?, data_consulta=?, estado=?, cidade=?,
-        especialidade=?, idade_paciente=?, sexo_paciente=?, valor_consulta=?,
-        forma_pagamento=?, tempo_espera_min=?, satisfacao_paciente=?,
-        receita_medicacao=?, status_consulta=?
-    WHERE id_consulta=?
-    """, dados + (id_consulta,))
-    conn.commit()
-    conn.close()
+    with conexao() as conn:
+        _registrar_alteracao(conn, _atualizar_uma(conn, (id_consulta, dados)))
 
+@cronometrar
 def excluir_consulta(id_consulta):
+    with conexao() as conn:
+        meses = _meses_das_consultas(conn, [id_consulta])
+        conn.execute("DELETE FROM consultas WHERE id_consulta=?", (id_consulta,))
+        _registrar_alteracao(conn, meses)
+
+# =========================================================
+# Listagem paginada e busca por ID
+# =========================================================
+
+# Colunas ordenáveis na tabela e o valor usado no lugar de NULL, para que
+# a comparação do keyset nunca envolva NULL (nulos aparecem primeiro)
+COLUNAS_ORDENAVEIS = {
+    "id_consulta": None,
+    "data_consulta": "''",
+    "estado": "''",
+    "cidade": "''",
+    "especialidade": "''",
+    "status_consulta": "''",
+    "valor_consulta": "-1",
+    "idade_paciente": "-1",
+    "tempo_espera_min": "-1",
+    "satisfacao_paciente": "-1",
+}
+
+COLUNAS_BUSCA = ["cidade", "estado", "especialidade", "status_consulta"]
+
+def _condicoes_busca(busca, filtros=None):
+    condicoes, parametros = montar_filtros(filtros)
+    busca = (busca or "").strip()
+    if busca:
+        alternativas = [f"{c} LIKE ?" for c in COLUNAS_BUSCA]
+        parametros += [f"%{busca}%"] * len(COLUNAS_BUSCA)
+        if busca.isdigit():
+            alternativas += ["id_consulta = ?", "id_paciente = ?", "id_medico = ?"]
+            parametros += [int(busca)] * 3
+        condicoes.append("(" + " OR ".join(alternativas) + ")")
+    return condicoes, parametros
+
+@cronometrar
+def listar_consultas_paginado(limite=50, ordenar_por="id_consulta", decrescente=False,
+                              apos=None, busca=None, filtros=None):
+    """
+    Uma página de consultas por keyset (WHERE chave > ? LIMIT ?), sem OFFSET.
+
+    `apos` é o cursor devolvido pela página anterior (None na primeira).
+    Retorna (df, proximo_cursor); proximo_cursor é None na última página.
+    """
+    if ordenar_por not in COLUNAS_ORDENAVEIS:
+        raise ValueError(f"Coluna de ordenação inválida: {ordenar_por}")
+    nulo = COLUNAS_ORDENAVEIS[ordenar_por]
+    chave = f"COALESCE({ordenar_por}, {nulo})" if nulo else ordenar_por
+
+    condicoes, parametros = _condicoes_busca(busca, filtros)
+    operador, direcao = ("<", "DESC") if decrescente else (">", "ASC")
+    if apos is not None:
+        if ordenar_por == "id_consulta":
+            condicoes.append(f"id_consulta {operador} ?")
+            parametros.append(apos[-1])
+        else:
+            condicoes.append(f"({chave}, id_consulta) {operador} (?, ?)")
+            parametros += list(apos)
+
+    ordem = f"id_consulta {direcao}"
+    if ordenar_por != "id_consulta":
+        ordem = f"{chave} {direcao}, " + ordem
+
+    colunas = ["id_consulta", *COLUNAS_INSERCAO]
+    sql = (
+        f"SELECT {', '.join(colunas)}, {chave} AS _chave FROM consultas "
+        f"{_clausula_where(condicoes)} ORDER BY {ordem} LIMIT ?"
+    )
+    # Uma linha a mais indica se existe próxima página
+    with conexao(somente_leitura=True) as conn:
+        linhas = conn.execute(sql, parametros + [int(limite) + 1]).fetchall()
+
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultima = linhas[-1]
+        proximo = (ultima[-1], ultima[0])
+
+    df = pd.DataFrame([linha[:-1] for linha in linhas], columns=colunas)
+    return df, proximo
+
+@cronometrar
+def contar_consultas(busca=None, filtros=None):
+    condicoes, parametros = _condicoes_busca(busca, filtros)
+    with conexao(somente_leitura=True) as conn:
+        return conn.execute(
+            f"SELECT COUNT(*) FROM consultas {_clausula_where(condicoes)}", parametros
+        ).fetchone()[0]
+
+@cronometrar
+def obter_consulta(id_consulta):
+    """Busca uma consulta pela chave primária. Retorna um dicionário ou None."""
+    colunas = ["id_consulta", *COLUNAS_INSERCAO]
+    with conexao(somente_leitura=True) as conn:
+        linha = conn.execute(
+            f"SELECT {', '.join(colunas)} FROM consultas WHERE id_consulta = ?", (int(id_consulta),)
+        ).fetchone()
+    return dict(zip(colunas, linha)) if linha else None
+
+# =========================================================
+# Versão dos dados (chave de invalidação do cache)
+# =========================================================
+def _meses_das_consultas(conn, ids):
+    ids = list(ids)
+    if not ids:
+        return set()
+    cursor = conn.execute(
+        f"SELECT DISTINCT ano_mes FROM consultas WHERE id_consulta IN ({_marcadores(ids)})", ids
+    )
+    return {linha[0] for linha in cursor.fetchall()}
+
+def _registrar_alteracao(conn, anos_meses=()):
+    """
+    Incrementa o contador global e marca os meses afetados com o novo valor.
+    Deve rodar na mesma transação da escrita.
+    """
+    conn.execute("UPDATE versoes_dados SET versao = versao + 1 WHERE ano_mes = 0")
+    nova = conn.execute("SELECT versao FROM versoes_dados WHERE ano_mes = 0").fetchone()[0]
+    conn.executemany("""
+    INSERT INTO versoes_dados (ano_mes, versao) VALUES (?, ?)
+    ON CONFLICT(ano_mes) DO UPDATE SET versao = excluded.versao
+    """, [(am, nova) for am in anos_meses if am])
+
+def versoes_por_mes(conn):
+    """
+    {ano_mes: versão} dos meses que têm consultas (0 = sem data, com o
+    contador global). Lê só versoes_dados e o resumo mensal, nunca consultas.
+    """
+    versoes = dict(conn.execute("SELECT ano_mes, versao FROM versoes_dados").fetchall())
+    return {
+        linha[0]: versoes.get(linha[0], 0)
+        for linha in conn.execute("SELECT DISTINCT ano_mes FROM consultas_resumo").fetchall()
+    }
+
+@cronometrar
+def versao_dados(filtros=None):
+    """
+    Versão dos dados vistos por uma consulta com estes filtros.
+
+    Com filtro de mês/ano, só escritas nos meses cobertos mudam o valor;
+    sem filtro de período, qualquer escrita muda.
+    """
+    condicoes, parametros = _condicoes_periodo(filtros or {})
+    with conexao(somente_leitura=True) as conn:
+        if not condicoes:
+            sql, parametros = "SELECT versao FROM versoes_dados WHERE ano_mes = 0", []
+        else:
+            sql = f"SELECT COALESCE(MAX(versao), 0) FROM versoes_dados WHERE ano_mes <> 0 AND {condicoes[0]}"
+        return conn.execute(sql, parametros).fetchone()[0]
+
+# =========================================================
+# Consultas agregadas (filtros e GROUP BY executados no SQLite)
+# =========================================================
+
+# Dimensões e métricas permitidas: os nomes nunca vêm do usuário direto para o SQL
+DIMENSOES = {
+    "mes": "printf('%04d-%02d', ano_mes / 100, ano_mes % 100)",
+    "ano_mes": "ano_mes",
+    "estado": "estado",
+    "cidade": "cidade",
+    "especialidade": "especialidade",
+    "status_consulta": "status_consulta",
+    "sexo_paciente": "sexo_paciente",
+    "receita_medicacao": "receita_medicacao",
+    "forma_pagamento": "forma_pagamento",
+    "idade_paciente": "idade_paciente",
+    "tempo_espera_min": "tempo_espera_min",
+    "satisfacao_paciente": "satisfacao_paciente",
+}
+
+METRICAS = {
+    "consultas": "COUNT(*)",
+    "receita": "SUM(valor_consulta)",
+    "idade_media": "AVG(idade_paciente)",
+    "satisfacao_media": "AVG(satisfacao_paciente)",
+    "espera_media": "AVG(tempo_espera_min)",
+    "receitas": "SUM(receita_medicacao = 'Sim')",
+}
+
+# As mesmas dimensões/métricas calculadas sobre consultas_resumo. Nulos foram
+# gravados como 0/'' no resumo, por isso o "IS NOT NULL" vira "<> 0/''".
+DIMENSOES_RESUMO = {
+    "mes": ("printf('%04d-%02d', ano_mes / 100, ano_mes % 100)", "ano_mes <> 0"),
+    "ano_mes": ("ano_mes", "ano_mes <> 0"),
+    "estado": ("estado", "estado <> ''"),
+    "especialidade": ("especialidade", "especialidade <> ''"),
+    "status_consulta": ("status_consulta", "status_consulta <> ''"),
+    "sexo_paciente": ("sexo_paciente", "sexo_paciente <> ''"),
+    "receita_medicacao": ("receita_medicacao", "receita_medicacao <> ''"),
+}
+
+METRICAS_RESUMO = {
+    "consultas": "SUM(consultas)",
+    "receita": "CASE WHEN SUM(n_valor) > 0 THEN SUM(soma_valor) END",
+    "idade_media": "SUM(soma_idade) / NULLIF(SUM(n_idade), 0)",
+    "satisfacao_media": "SUM(soma_satisfacao) / NULLIF(SUM(n_satisfacao), 0)",
+    "espera_media": "SUM(soma_espera) / NULLIF(SUM(n_espera), 0)",
+    "receitas": "SUM(CASE WHEN receita_medicacao = 'Sim' THEN consultas ELSE 0 END)",
+}
+
+def _marcadores(valores):
+    return ", ".join("?" * len(valores))
+
+def montar_filtros(filtros=None):
+    """
+    Converte o estado dos filtros laterais em uma cláusula WHERE parametrizada.
+
+    `filtros` é um dicionário com as chaves opcionais "estados",
+    "especialidades", "meses" e "anos" (listas vazias não filtram).
+    Retorna (condicoes, parametros).
+    """
+    filtros = filtros or {}
+    condicoes, parametros = [], []
+
+    if filtros.get("estados"):
+        condicoes.append(f"estado IN ({_marcadores(filtros['estados'])})")
+        parametros += list(filtros["estados"])
+    if filtros.get("especialidades"):
+        condicoes.append(f"especialidade IN ({_marcadores(filtros['especialidades'])})")
+        parametros += list(filtros["especialidades"])
+
+    periodo, parametros_periodo = _condicoes_periodo(filtros)
+    return condicoes + periodo, parametros + parametros_periodo
+
+def _condicoes_periodo(filtros):
+    """Filtros de mês e ano sobre a coluna indexada ano_mes (AAAAMM)."""
+    meses = [int(m) for m in filtros.get("meses") or []]
+    anos = [int(a) for a in filtros.get("anos") or []]
+    if anos and meses:
+        valores = [a * 100 + m for a in anos for m in meses]
+        return [f"ano_mes IN ({_marcadores(valores)})"], valores
+    if anos:
+        parametros = []
+        for a in anos:
+            parametros += [a * 100 + 1, a * 100 + 12]
+        return ["(" + " OR ".join("ano_mes BETWEEN ? AND ?" for _ in anos) + ")"], parametros
+    if meses:
+        return [f"ano_mes % 100 IN ({_marcadores(meses)})"], meses
+    return [], []
+
+def _clausula_where(condicoes):
+    return f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+def _consultar_df(sql, parametros=()):
+    # Com o perfil ligado, registra a leitura completa (execução + fetch) e o nº de linhas
+    with medir("crud.leitura_sql", detalhe=sql) as medicao:
+        with conexao(somente_leitura=True) as conn:
+            df = pd.read_sql_query(sql, conn, params=list(parametros))
+        if medicao is not None:
+            medicao["linhas"] = len(df)
+    return df
+
+@cronometrar
+def listar_valores_distintos(coluna):
+    """Valores distintos (ordenados) de uma dimensão, para popular os filtros e formulários."""
+    expressao = DIMENSOES[coluna]
+    df = _consultar_df(
+        f"SELECT DISTINCT {expressao} AS valor FROM consultas "
+        f"WHERE {expressao} IS NOT NULL ORDER BY valor"
+    )
+    return df["valor"].tolist()
+
+@cronometrar
+def listar_anos():
+    df = _consultar_df(
+        "SELECT DISTINCT ano_mes / 100 AS ano "
+        "FROM consultas WHERE ano_mes IS NOT NULL ORDER BY ano"
+    )
+    return df["ano"].tolist()
+
+def _pode_usar_resumo(dimensoes, metricas):
+    return all(d in DIMENSOES_RESUMO for d in dimensoes) and all(m in METRICAS_RESUMO for m in metricas)
+
+@cronometrar
+def agregar_consultas(filtros=None, dimensoes=(), metricas=("consultas",),
+                      ordenar_por=None, decrescente=False, limite=None, usar_resumo=True):
+    """
+    Executa um GROUP BY no banco e devolve apenas as linhas agregadas.
+
+    Quando todas as dimensões e métricas existem em consultas_resumo, a
+    consulta é feita no resumo (custo constante); senão, em consultas.
+    Assim como o groupby do pandas, linhas com dimensão nula são descartadas.
+    Sem `ordenar_por`, o resultado vem ordenado pelas dimensões.
+    """
+    condicoes, parametros = montar_filtros(filtros)
+    if usar_resumo and _pode_usar_resumo(dimensoes, metricas):
+        tabela = "consultas_resumo"
+        selecao = [f"{DIMENSOES_RESUMO[d][0]} AS {d}" for d in dimensoes]
+        selecao += [f"{METRICAS_RESUMO[m]} AS {m}" for m in metricas]
+        condicoes += [DIMENSOES_RESUMO[d][1] for d in dimensoes]
+    else:
+        tabela = "consultas"
+        selecao = [f"{DIMENSOES[d]} AS {d}" for d in dimensoes]
+        selecao += [f"{METRICAS[m]} AS {m}" for m in metricas]
+        condicoes += [f"{DIMENSOES[d]} IS NOT NULL" for d in dimensoes]
+
+    sql = f"SELECT {', '.join(selecao)} FROM {tabela} {_clausula_where(condicoes)}"
+    if dimensoes:
+        sql += f" GROUP BY {', '.join(dimensoes)}"
+
+    ordem = ordenar_por or (list(dimensoes) if dimensoes else None)
+    if ordem:
+        ordem = [ordem] if isinstance(ordem, str) else ordem
+        for coluna in ordem:
+            if coluna not in dimensoes and coluna not in metricas:
+                raise ValueError(f"Coluna de ordenação inválida: {coluna}")
+        direcao = " DESC" if decrescente else ""
+        sql += " ORDER BY " + ", ".join(f"{c}{direcao}" for c in ordem)
+    if limite:
+        sql += f" LIMIT {int(limite)}"
+
+    return _consultar_df(sql, parametros)
+
+@cronometrar
+def carregar_colunas(filtros=None, colunas=()):
+    """Lê apenas as colunas pedidas das linhas que passam nos filtros (já tipadas pelo esquema)."""
+    permitidas = {"id_consulta", *COLUNAS_INSERCAO}
+    for coluna in colunas:
+        if coluna not in permitidas:
+            raise ValueError(f"Coluna inválida: {coluna}")
+    condicoes, parametros = montar_filtros(filtros)
+    sql = f"SELECT {', '.join(colunas)} FROM consultas {_clausula_where(condicoes)}"
+    return aplicar_esquema(_consultar_df(sql, parametros))
+
+def iterar_consultas(filtros=None, colunas=None, tamanho_lote=5000):
+    """
+    Gera as linhas filtradas em lotes de tuplas, sem montar tudo em memória.
+    Usa uma conexão própria (uma exportação longa não segura uma do pool).
+    """
+    colunas = list(colunas or ["id_consulta", *COLUNAS_INSERCAO])
+    permitidas = {"id_consulta", *COLUNAS_INSERCAO}
+    for coluna in colunas:
+        if coluna not in permitidas:
+            raise ValueError(f"Coluna inválida: {coluna}")
+    condicoes, parametros = montar_filtros(filtros)
+    sql = f"SELECT {', '.join(colunas)} FROM consultas {_clausula_where(condicoes)} ORDER BY id_consulta"
+    conn = create_connection(somente_leitura=True)
+    try:
+        cursor = conn.execute(sql, parametros)
+        while lote := cursor.fetchmany(tamanho_lote):
+            yield lote
+    finally:
+        conn.close()
+
+@cronometrar
+def amostrar_colunas(filtros=None, colunas=(), estrato="especialidade", limite=5000):
+    """
+    Amostra aleatória estratificada (alocação proporcional) de no máximo
+    ~`limite` linhas, com pelo menos uma linha por estrato.
+    """
+    permitidas = {"id_consulta", *COLUNAS_INSERCAO}
+    for coluna in [*colunas, estrato]:
+        if coluna not in permitidas:
+            raise ValueError(f"Coluna inválida: {coluna}")
+    condicoes, parametros = montar_filtros(filtros)
+    sql = f"""
+    SELECT {', '.join(colunas)} FROM (
+        SELECT {', '.join(colunas)},
+               ROW_NUMBER() OVER (PARTITION BY {estrato} ORDER BY random()) AS _ordem,
+               COUNT(*) OVER (PARTITION BY {estrato}) AS _no_estrato,
+               COUNT(*) OVER () AS _total
+        FROM consultas {_clausula_where(condicoes)}
+    )
+    WHERE _ordem <= MAX(1, CAST(_no_estrato * ? / _total AS INTEGER))
+    """
+    return aplicar_esquema(_consultar_df(sql, parametros + [float(limite)]))
+
+# =========================================================
+# Importar CSV (carga completa)
+# =========================================================
+CSV_PATH = "data/dataset_saude.csv"
+
+# Ordem das colunas no INSERT (a mesma usada em inserir_consulta)
+COLUNAS_INSERCAO = [
+    "id_paciente", "id_medico", "data_consulta", "estado", "cidade",
+    "especialidade", "idade_paciente", "sexo_paciente", "valor_consulta",
+    "forma_pagamento", "tempo_espera_min", "satisfacao_paciente",
+    "receita_medicacao", "status_consulta"
+]
+
+# Tipos explícitos para a leitura do CSV (mesmo esquema do carregamento do banco)
+CSV_DTYPES = tipos_csv(COLUNAS_INSERCAO)
+
+SQL_INSERCAO = f"""
+INSERT INTO consultas ({", ".join(COLUNAS_INSERCAO)})
+VALUES ({", ".join("?" * len(COLUNAS_INSERCAO))})
+"""
+
+def _preparar_lote(chunk):
+    """Converte um chunk do CSV em tuplas prontas para o executemany (sem iterrows)."""
+    chunk = chunk.copy()
+    # Normaliza a data para YYYY-MM-DD, igual ao formato gravado pelo formulário
+    datas = pd.to_datetime(chunk["data_consulta"], errors="coerce")
+    chunk["data_consulta"] = datas.dt.strftime("%Y-%m-%d")
+    return _tuplas(chunk)
+
+def _tuplas(df):
+    """Linhas de COLUNAS_INSERCAO como tuplas; NaN/NA/NaT viram None (NULL no SQLite)."""
+    colunas = []
+    for coluna in COLUNAS_INSERCAO:
+        serie = df[coluna].astype(object)
+        colunas.append(serie.where(df[coluna].notna(), None).tolist())
+    return list(zip(*colunas))
+
+@cronometrar
+def importar_csv_para_banco(caminho=CSV_PATH, chunksize=50_000, progresso=None):
+    """
+    Importa o CSV em lotes, numa única transação.
+
+    `progresso`, se informado, é chamado após cada lote com
+    (linhas_importadas, segundos_decorridos). Retorna um dicionário com
+    o total de linhas, o tempo gasto e a taxa em linhas/segundo.
+    """
+    inicio = time.perf_counter()
+    total = 0
+
+    # Conexão dedicada (fora do pool): os PRAGMAs abaixo valem só para ela,
+    # que é fechada ao final da carga
     conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM consultas WHERE id_consulta=?", (id_consulta,))
-    conn.commit()
-    conn.close()
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -200000")
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        ultimo_id = cursor.execute("SELECT COALESCE(MAX(id_consulta), 0) FROM consultas").fetchone()[0]
+        # Sem gatilhos durante a carga: o resumo é somado de uma vez no final
+        remover_gatilhos_resumo(cursor)
+        leitor = pd.read_csv(
+            caminho, usecols=COLUNAS_INSERCAO, dtype=CSV_DTYPES, chunksize=chunksize
+        )
+        for chunk in leitor:
+            cursor.executemany(SQL_INSERCAO, _preparar_lote(chunk))
+            total += len(chunk)
+            if progresso:
+                progresso(total, time.perf_counter() - inicio)
+        acumular_resumo(cursor, ultimo_id)
+        criar_gatilhos_resumo(cursor)
+        meses = cursor.execute(
+            "SELECT DISTINCT ano_mes FROM consultas WHERE id_consulta > ?", (ultimo_id,)
+        ).fetchall()
+        _registrar_alteracao(conn, [linha[0] for linha in meses])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "linhas": total,
+        "segundos": segundos,
+        "linhas_por_segundo": total / segundos if segundos > 0 else 0.0,
+    }
 
 # =========================================================
-# Importar CSV inicial (só se banco estiver vazio)
+# Sincronização incremental do CSV
 # =========================================================
-def importar_csv_para_banco():
-    df_csv = pd.read_csv("data/dataset_saude.csv")
-    df_csv["data_consulta"] = pd.to_datetime(df_csv["data_consulta"], errors="coerce")
+# O arquivo de origem cresce ao longo do dia. Para cada arquivo guardamos a
+# impressão digital (SHA-256) dos primeiros bytes e a posição, em bytes, até
+# onde ele já foi importado. Cada sincronização lê só o trecho novo, em lotes,
+# e cada lote é confirmado junto com a nova posição: uma carga interrompida
+# retoma do último lote gravado. Se o início do arquivo mudar (arquivo
+# substituído), a leitura recomeça do zero.
+# Linhas cuja chave natural (paciente, médico, data) já existe são ignoradas.
+# A leitura é por linhas: campos com quebra de linha não são suportados.
+
+BYTES_IMPRESSAO = 64 * 1024
+CHAVE_NATURAL = ["id_paciente", "id_medico", "data_consulta"]
+
+SQL_INSERCAO_SEM_DUPLICATAS = f"""
+INSERT INTO consultas ({", ".join(COLUNAS_INSERCAO)})
+SELECT {", ".join(COLUNAS_INSERCAO)} FROM temp.lote_csv AS l
+WHERE l.rowid IN (SELECT MIN(rowid) FROM temp.lote_csv GROUP BY {", ".join(CHAVE_NATURAL)})
+  AND NOT EXISTS (
+      SELECT 1 FROM consultas AS c
+      WHERE {" AND ".join(f"c.{coluna} IS l.{coluna}" for coluna in CHAVE_NATURAL)}
+  )
+"""
+
+def _impressao_arquivo(caminho, tamanho):
+    with open(caminho, "rb") as arquivo:
+        return hashlib.sha256(arquivo.read(tamanho)).hexdigest()
+
+def estado_sincronizacao(caminho=CSV_PATH):
+    """Estado salvo da sincronização do arquivo, ou None se ele nunca foi lido."""
+    with conexao(somente_leitura=True) as conn:
+        linha = conn.execute("""
+        SELECT impressao, bytes_impressao, posicao, linhas, atualizado_em
+        FROM sincronizacao_csv WHERE arquivo = ?
+        """, (os.path.abspath(caminho),)).fetchone()
+    if linha is None:
+        return None
+    return dict(zip(["impressao", "bytes_impressao", "posicao", "linhas", "atualizado_em"], linha))
+
+def _ponto_de_retomada(conn, caminho, tamanho):
+    """(posição em bytes, linhas já lidas) de onde continuar; (0, 0) se o arquivo é novo ou mudou."""
+    linha = conn.execute(
+        "SELECT impressao, bytes_impressao, posicao, linhas FROM sincronizacao_csv WHERE arquivo = ?",
+        (os.path.abspath(caminho),)
+    ).fetchone()
+    if linha is None:
+        return 0, 0
+    impressao, bytes_impressao, posicao, linhas = linha
+    if tamanho < max(posicao, bytes_impressao) or _impressao_arquivo(caminho, bytes_impressao) != impressao:
+        return 0, 0
+    return posicao, linhas
+
+@cronometrar
+def sincronizar_csv(caminho=CSV_PATH, chunksize=50_000, progresso=None):
+    """
+    Importa apenas as linhas do CSV que ainda não foram lidas.
+
+    Cada lote roda em sua própria transação, que também grava a nova posição
+    no arquivo. Uma linha final sem quebra de linha (ainda sendo escrita)
+    fica para a próxima sincronização. `progresso` recebe
+    (linhas_lidas, segundos_decorridos) após cada lote.
+    """
+    inicio = time.perf_counter()
+    lidas = inseridas = 0
+    tamanho = os.path.getsize(caminho)
+    bytes_impressao = min(tamanho, BYTES_IMPRESSAO)
+    impressao = _impressao_arquivo(caminho, bytes_impressao)
 
     conn = create_connection()
-    cursor = conn.cursor()
-
-    for _, row in df_csv.iterrows():
-        cursor.execute("""
-        INSERT INTO consultas (
-            id_paciente, id_medico, data_consulta, estado, cidade,
-            especialidade, idade_paciente, sexo_paciente, valor_consulta,
-            forma_pagamento, tempo_espera_min, satisfacao_paciente,
-            receita_medicacao, status_consulta
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            int(row["id_paciente"]),
-            int(row["id_medico"]),
-            str(row["data_consulta"].date()) if pd.notna(row["data_consulta"]) else None,
-            row["estado"],
-            row["cidade"],
-            row["especialidade"],
-            int(row["idade_paciente"]),
-            row["sexo_paciente"],
-            float(row["valor_consulta"]),
-            row["forma_pagamento"],
-            int(row["tempo_espera_min"]),
-            float(row["satisfacao_paciente"]) if pd.notna(row["satisfacao_paciente"]) else None,
-            row["receita_medicacao"],
-            row["status_consulta"]
-        ))
-    conn.commit()
-    conn.close()
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -200000")
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS lote_csv ({', '.join(COLUNAS_INSERCAO)})")
+        posicao, linhas_anteriores = _ponto_de_retomada(conn, caminho, tamanho)
+        retomado_de = posicao
+
+        with open(caminho, "rb") as arquivo:
+            cabecalho = arquivo.readline()
+            colunas = next(csv.reader([cabecalho.decode("utf-8-sig")]))
+            posicao = max(posicao, len(cabecalho))
+            arquivo.seek(posicao)
+
+            while cabecalho.endswith(b"\n"):
+                linhas_brutas = list(islice(arquivo, chunksize))
+                incompleta = bool(linhas_brutas) and not linhas_brutas[-1].endswith(b"\n")
+                if incompleta:
+                    linhas_brutas.pop()
+                if not linhas_brutas:
+                    break
+                bloco = b"".join(linhas_brutas)
+                chunk = pd.read_csv(
+                    io.BytesIO(bloco), header=None, names=colunas,
+                    usecols=COLUNAS_INSERCAO, dtype=CSV_DTYPES
+                )
+
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    ultimo_id = cursor.execute("SELECT COALESCE(MAX(id_consulta), 0) FROM consultas").fetchone()[0]
+                    remover_gatilhos_resumo(cursor)
+                    cursor.execute("DELETE FROM temp.lote_csv")
+                    cursor.executemany(
+                        f"INSERT INTO temp.lote_csv VALUES ({', '.join('?' * len(COLUNAS_INSERCAO))})",
+                        _preparar_lote(chunk)
+                    )
+                    novas = cursor.execute(SQL_INSERCAO_SEM_DUPLICATAS).rowcount
+                    acumular_resumo(cursor, ultimo_id)
+                    criar_gatilhos_resumo(cursor)
+                    if novas:
+                        meses = cursor.execute(
+                            "SELECT DISTINCT ano_mes FROM consultas WHERE id_consulta > ?", (ultimo_id,)
+                        ).fetchall()
+                        _registrar_alteracao(conn, [linha[0] for linha in meses])
+                    posicao += len(bloco)
+                    lidas += len(chunk)
+                    cursor.execute("""
+                    INSERT INTO sincronizacao_csv (arquivo, impressao, bytes_impressao, posicao, linhas, atualizado_em)
+                    VALUES (?, ?, ?, ?, ?, datetime('now'))
+                    ON CONFLICT(arquivo) DO UPDATE SET
+                        impressao = excluded.impressao, bytes_impressao = excluded.bytes_impressao,
+                        posicao = excluded.posicao, linhas = excluded.linhas,
+                        atualizado_em = excluded.atualizado_em
+                    """, (os.path.abspath(caminho), impressao, bytes_impressao, posicao,
+                          linhas_anteriores + lidas))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                inseridas += novas
+
+                if progresso:
+                    progresso(lidas, time.perf_counter() - inicio)
+                if incompleta:
+                    break
+    finally:
+        conn.close()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "linhas": lidas,
+        "inseridas": inseridas,
+        "duplicadas": lidas - inseridas,
+        "retomado_de": retomado_de,
+        "posicao": posicao,
+        "segundos": segundos,
+        "linhas_por_segundo": lidas / segundos if segundos > 0 else 0.0,
+    }
 
 def inicializar_banco():
     create_table()
 
-    # Verifica se o banco está vazio
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM consultas")
-    count = cursor.fetchone()[0]
-    conn.close()
-
-    # Se estiver vazio, importa os dados do CSV
-    if count == 0:
-        importar_csv_para_banco()
+    # Importa o que houver de novo no CSV (na primeira execução, o arquivo todo)
+    if os.path.exists(CSV_PATH):
+        stats = sincronizar_csv(CSV_PATH)
+        if stats["linhas"]:
+            print(f"CSV sincronizado: {stats['inseridas']} novas, {stats['duplicadas']} já existentes "
+                  f"em {stats['segundos']:.2f}s ({stats['linhas_por_segundo']:.0f} linhas/s)")
+
+# =========================================================
+# Operações em lote
+# =========================================================
+# Cada função roda o lote inteiro em uma transação (um único commit).
+# Com tudo_ou_nada=True qualquer falha desfaz o lote; com False cada
+# linha roda em um SAVEPOINT e as que falham são puladas. O retorno
+# sempre traz {"sucesso": n, "falhas": [(posicao, mensagem), ...]}.
+
+STATUS_VALIDOS = {"realizada", "cancelada", "nao compareceu"}
+CAMPOS_OBRIGATORIOS = ["id_paciente", "id_medico", "data_consulta", "estado", "especialidade", "status_consulta"]
+COLUNAS_NUMERICAS = {c: tipo.startswith("Int") for c, tipo in CSV_DTYPES.items() if tipo != "string"}
+
+def _validar_consulta(dados):
+    """Valida os campos e devolve a tupla pronta para gravar (data em AAAA-MM-DD)."""
+    if len(dados) != len(COLUNAS_INSERCAO):
+        raise ValueError(f"esperados {len(COLUNAS_INSERCAO)} campos, recebidos {len(dados)}")
+    registro = dict(zip(COLUNAS_INSERCAO, dados))
+    faltando = [c for c in CAMPOS_OBRIGATORIOS if registro[c] is None or registro[c] == ""]
+    if faltando:
+        raise ValueError(f"campos obrigatórios vazios: {', '.join(faltando)}")
+    if registro["status_consulta"] not in STATUS_VALIDOS:
+        raise ValueError(f"status inválido: {registro['status_consulta']}")
+    for coluna, inteiro in COLUNAS_NUMERICAS.items():
+        valor = registro[coluna]
+        if valor is None:
+            continue
+        if isinstance(valor, bool) or not isinstance(valor, numbers.Real) or (inteiro and valor % 1):
+            raise ValueError(f"valor inválido em {coluna}: {valor!r}")
+    registro["data_consulta"] = _normalizar_data(registro["data_consulta"])
+    return tuple(registro.values())
+
+def _normalizar_data(valor):
+    """
+    Data em AAAA-MM-DD, o formato de que a coluna ano_mes depende. Aceita
+    date/datetime e textos ISO; outros formatos ("17/07/2024") são recusados
+    em vez de gravados como vieram.
+    """
+    if isinstance(valor, date):
+        return valor.strftime("%Y-%m-%d")
+    try:
+        return datetime.strptime(str(valor), "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"data inválida em data_consulta (use AAAA-MM-DD): {valor!r}") from None
+
+def _executar_lote(itens, operacao, tudo_ou_nada):
+    """
+    Aplica `operacao(conn, item)` a cada item numa única transação.
+    A operação devolve o conjunto de meses (ano_mes) que alterou.
+    """
+    sucesso, falhas, meses = 0, [], set()
+    with conexao() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for posicao, item in enumerate(itens):
+            if not tudo_ou_nada:
+                conn.execute("SAVEPOINT linha")
+            try:
+                meses |= operacao(conn, item)
+                sucesso += 1
+            except (ValueError, sqlite3.Error) as erro:
+                falhas.append((posicao, str(erro)))
+                if tudo_ou_nada:
+                    conn.rollback()
+                    return {"sucesso": 0, "falhas": falhas}
+                conn.execute("ROLLBACK TO linha")
+            finally:
+                if not tudo_ou_nada:
+                    conn.execute("RELEASE linha")
+        if sucesso:
+            _registrar_alteracao(conn, meses)
+    return {"sucesso": sucesso, "falhas": falhas}
+
+def _inserir_uma(conn, dados):
+    dados = _validar_consulta(dados)
+    cursor = conn.execute(SQL_INSERCAO, dados)
+    return _meses_das_consultas(conn, [cursor.lastrowid])
+
+def _atualizar_uma(conn, item):
+    id_consulta, dados = item
+    dados = _validar_consulta(dados)
+    meses = _meses_das_consultas(conn, [id_consulta])
+    cursor = conn.execute(f"""
+    UPDATE consultas SET {", ".join(f"{c}=?" for c in COLUNAS_INSERCAO)}
+    WHERE id_consulta=?
+    """, dados + (int(id_consulta),))
+    if cursor.rowcount == 0:
+        raise ValueError(f"consulta {id_consulta} não encontrada")
+    return meses | _meses_das_consultas(conn, [id_consulta])
+
+def _excluir_uma(conn, id_consulta):
+    meses = _meses_das_consultas(conn, [id_consulta])
+    cursor = conn.execute("DELETE FROM consultas WHERE id_consulta=?", (int(id_consulta),))
+    if cursor.rowcount == 0:
+        raise ValueError(f"consulta {id_consulta} não encontrada")
+    return meses
+
+# Operação -> função (conn, item) usada nos lotes; item é a tupla de dados,
+# (id_consulta, dados) ou o id_consulta, respectivamente
+OPERACOES_ESCRITA = {
+    "inserir": _inserir_uma,
+    "atualizar": _atualizar_uma,
+    "excluir": _excluir_uma,
+}
+
+@cronometrar
+def inserir_consultas(lista, tudo_ou_nada=True):
+    """Insere várias consultas (tuplas no formato de inserir_consulta)."""
+    return _executar_lote(lista, _inserir_uma, tudo_ou_nada)
+
+@cronometrar
+def atualizar_consultas(atualizacoes, tudo_ou_nada=True):
+    """Atualiza várias consultas; `atualizacoes` é uma lista de (id_consulta, dados)."""
+    return _executar_lote(atualizacoes, _atualizar_uma, tudo_ou_nada)
+
+@cronometrar
+def excluir_consultas(ids, tudo_ou_nada=True):
+    """Exclui várias consultas pelo ID."""
+    return _executar_lote(ids, _excluir_uma, tudo_ou_nada)
+
+@cronometrar
+def excluir_consultas_por_filtro(filtros, permitir_tudo=False):
+    """
+    Exclui todas as consultas que passam nos filtros (mesmo formato da barra
+    lateral) em um único DELETE. Sem filtros, só exclui com permitir_tudo=True.
+    Retorna o número de consultas excluídas.
+    """
+    condicoes, parametros = montar_filtros(filtros)
+    if not condicoes and not permitir_tudo:
+        raise ValueError("Nenhum filtro informado: use permitir_tudo=True para excluir tudo")
+    where = _clausula_where(condicoes)
+    with conexao() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        meses = [linha[0] for linha in conn.execute(f"SELECT DISTINCT ano_mes FROM consultas {where}", parametros)]
+        excluidas = conn.execute(f"DELETE FROM consultas {where}", parametros).rowcount
+        if excluidas:
+            _registrar_alteracao(conn, meses)
+    return excluidas
+
+def preparar_planilha(df):
+    """
+    Converte uma planilha enviada (CSV/Excel) em tuplas para as funções em lote.
+
+    Células que não são número ou data AAAA-MM-DD seguem como vieram, e a
+    validação da linha as recusa citando a coluna e o valor (em vez de virarem
+    vazias). Retorna (ids, tuplas); ids é None se não houver id_consulta.
+    """
+    faltando = [c for c in COLUNAS_INSERCAO if c not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes na planilha: {', '.join(faltando)}")
+    planilha = df[COLUNAS_INSERCAO].copy()
+    for coluna, tipo in CSV_DTYPES.items():
+        # Células só com espaços contam como vazias
+        original = planilha[coluna].replace(r"^\s*$", None, regex=True)
+        if coluna == "data_consulta":
+            # Excel já traz datas; textos só no formato ISO ("04/03/2024" é ambíguo)
+            convertido = pd.to_datetime(original, errors="coerce", format="ISO8601").dt.strftime("%Y-%m-%d")
+        elif tipo == "string":
+            planilha[coluna] = original.astype("string").str.strip()
+            continue
+        else:
+            convertido = pd.to_numeric(original, errors="coerce")
+            if tipo.startswith("Int"):
+                convertido = convertido.where(convertido % 1 == 0).astype(tipo)
+        planilha[coluna] = convertido.astype(object).where(convertido.notna() | original.isna(), original)
+    ids = None
+    if "id_consulta" in df.columns:
+        ids = pd.to_numeric(df["id_consulta"], errors="coerce").astype("Int64").tolist()
+    return ids, _tuplas(planilha)
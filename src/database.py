@@ -1,12 +1,179 @@
+import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from perfil import perfilador, rotulo_sql
+
+DB_PATH = os.environ.get("DASHBOARD_SAUDE_DB", "consultas.db")
+
+# PRAGMAs aplicados a toda conexão (ajustáveis com configurar_banco)
+PRAGMAS = {
+    "busy_timeout": 5000,           # ms esperando o lock antes de "database is locked"
+    "cache_size": -20000,           # KiB (valor negativo) de cache de páginas por conexão
+    "mmap_size": 256 * 1024 * 1024, # leitura via memória mapeada
+    "temp_store": "MEMORY",
+    "synchronous": "NORMAL",        # seguro em modo WAL e bem mais rápido que FULL
+}
+
+# Tamanho dos pools: o SQLite aceita um único escritor por vez, então um
+# pool de escrita com 1 conexão evita disputa de lock dentro do processo.
+TAMANHO_POOL_LEITURA = 8
+TAMANHO_POOL_ESCRITA = 1
+
+def _aplicar_pragmas(conn, pragmas):
+    for nome, valor in pragmas.items():
+        conn.execute(f"PRAGMA {nome} = {valor}")
+
+# Cursor que registra no perfil o tempo de cada comando (e as linhas
+# afetadas, nas escritas). Para SELECT, o tempo vai até a primeira linha;
+# a leitura completa é medida em crud._consultar_df. O Connection.execute()
+# do sqlite3 cria um Cursor comum sem passar por self.cursor(), por isso a
+# ConexaoMedida redefine execute/executemany para usar este cursor.
+class CursorMedido(sqlite3.Cursor):
+    def execute(self, sql, parametros=()):
+        if not perfilador.ativo:
+            return super().execute(sql, parametros)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            perfilador.registrar(rotulo_sql(sql), inicio, time.perf_counter() - inicio, self.rowcount)
+
+    def executemany(self, sql, sequencia):
+        if not perfilador.ativo:
+            return super().executemany(sql, sequencia)
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, sequencia)
+        finally:
+            perfilador.registrar(rotulo_sql(sql), inicio, time.perf_counter() - inicio, self.rowcount)
+
+class ConexaoMedida(sqlite3.Connection):
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
 
 # Conexão com o banco
-def create_connection():
-    return sqlite3.connect("consultas.db", check_same_thread=False)
+def create_connection(caminho=None, somente_leitura=False):
+    caminho = caminho or DB_PATH
+    if somente_leitura:
+        conn = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True, check_same_thread=False, factory=ConexaoMedida)
+    else:
+        conn = sqlite3.connect(caminho, check_same_thread=False, factory=ConexaoMedida)
+    _aplicar_pragmas(conn, PRAGMAS)
+    return conn
+
+# =========================================================
+# Pool de conexões
+# =========================================================
+class PoolConexoes:
+    """
+    Pool thread-safe de conexões SQLite.
+
+    As sessões do Streamlit rodam em threads diferentes; cada conexão é
+    usada por uma thread de cada vez e devolvida ao pool ao final do bloco.
+    """
+
+    def __init__(self, caminho, tamanho, somente_leitura=False, timeout=30):
+        self.caminho = caminho
+        self.somente_leitura = somente_leitura
+        self.timeout = timeout
+        self._livres = queue.LifoQueue()
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self._todas = []
+        self._lock = threading.Lock()
+
+    def _obter(self):
+        if not self._vagas.acquire(timeout=self.timeout):
+            raise TimeoutError("Nenhuma conexão livre no pool")
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            conn = create_connection(self.caminho, self.somente_leitura)
+        except Exception:
+            self._vagas.release()
+            raise
+        with self._lock:
+            self._todas.append(conn)
+        return conn
+
+    def _devolver(self, conn):
+        self._livres.put(conn)
+        self._vagas.release()
+
+    @contextmanager
+    def conexao(self):
+        conn = self._obter()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._devolver(conn)
+
+    def fechar(self):
+        with self._lock:
+            for conn in self._todas:
+                conn.close()
+            self._todas.clear()
+        self._livres = queue.LifoQueue()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def configurar_banco(caminho=None, tamanho_leitura=None, tamanho_escrita=None, **pragmas):
+    """Troca o arquivo do banco e/ou os PRAGMAs; os pools atuais são fechados."""
+    global DB_PATH, TAMANHO_POOL_LEITURA, TAMANHO_POOL_ESCRITA
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.fechar()
+        _pools.clear()
+        if caminho:
+            DB_PATH = caminho
+        if tamanho_leitura:
+            TAMANHO_POOL_LEITURA = tamanho_leitura
+        if tamanho_escrita:
+            TAMANHO_POOL_ESCRITA = tamanho_escrita
+        PRAGMAS.update(pragmas)
+
+def _obter_pool(somente_leitura):
+    with _pools_lock:
+        pool = _pools.get(somente_leitura)
+        if pool is None:
+            tamanho = TAMANHO_POOL_LEITURA if somente_leitura else TAMANHO_POOL_ESCRITA
+            pool = PoolConexoes(DB_PATH, tamanho, somente_leitura=somente_leitura)
+            _pools[somente_leitura] = pool
+        return pool
+
+@contextmanager
+def conexao(somente_leitura=False):
+    """
+    Empresta uma conexão do pool.
+
+    Ao sair do bloco a transação é confirmada (ou desfeita em caso de erro)
+    e a conexão volta para o pool. Conexões de leitura abrem o banco em
+    modo somente leitura.
+    """
+    with _obter_pool(somente_leitura).conexao() as conn:
+        yield conn
 
 # Criar tabela se não existir
 def create_table():
     conn = create_connection()
+    # WAL: leitores não bloqueiam o escritor (a configuração fica gravada no arquivo)
+    conn.execute("PRAGMA journal_mode = WAL")
     cursor = conn.cursor()
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS consultas (
@@ -29,3 +196,248 @@ def create_table():
     """)
     conn.commit()
     conn.close()
+    migrar_banco()
+
+# =========================================================
+# Migrações de esquema
+# =========================================================
+# A versão aplicada fica em PRAGMA user_version. Cada migração roda uma
+# única vez, dentro de uma transação, então bancos antigos (consultas.db
+# já existentes) são atualizados no lugar sem perder dados.
+
+def _coluna_existe(cursor, tabela, coluna):
+    # table_xinfo também lista colunas geradas (table_info as omite)
+    cursor.execute(f"PRAGMA table_xinfo({tabela})")
+    return any(linha[1] == coluna for linha in cursor.fetchall())
+
+def _migracao_1(cursor):
+    # Ano e mês como inteiro AAAAMM, derivado do texto AAAA-MM-DD.
+    # Coluna gerada VIRTUAL: não ocupa espaço na tabela, só no índice.
+    if not _coluna_existe(cursor, "consultas", "ano_mes"):
+        cursor.execute("""
+        ALTER TABLE consultas ADD COLUMN ano_mes INTEGER
+        GENERATED ALWAYS AS (
+            CAST(substr(data_consulta, 1, 4) || substr(data_consulta, 6, 2) AS INTEGER)
+        ) VIRTUAL
+        """)
+
+    # Índices alinhados aos filtros e agrupamentos do dashboard
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_consultas_ano_mes_status ON consultas (ano_mes, status_consulta)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_consultas_estado_esp_ano_mes ON consultas (estado, especialidade, ano_mes)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_consultas_esp_ano_mes ON consultas (especialidade, ano_mes)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_consultas_status ON consultas (status_consulta)")
+
+def _migracao_2(cursor):
+    # Versão dos dados por mês (AAAAMM). A linha 0 guarda o contador global.
+    # As funções de escrita incrementam o mês afetado, o que permite ao
+    # cache descartar só o que depende daquele período.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS versoes_dados (
+        ano_mes INTEGER PRIMARY KEY,
+        versao INTEGER NOT NULL
+    )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO versoes_dados (ano_mes, versao) VALUES (0, 0)")
+
+# =========================================================
+# Tabela de resumo (rollup mensal)
+# =========================================================
+# Uma linha por mês x estado x especialidade x status x sexo x receita, com
+# contagens, somas e somas de quadrados. É mantida por gatilhos a cada
+# INSERT/UPDATE/DELETE em consultas, então os gráficos agregados leem
+# poucas linhas, independentemente do tamanho da tabela.
+# Chaves nulas viram 0 (ano_mes) ou '' (texto): a UNIQUE do SQLite não
+# considera NULLs iguais e o upsert não os encontraria.
+
+CHAVES_RESUMO = {
+    "ano_mes": "COALESCE({p}ano_mes, 0)",
+    "estado": "COALESCE({p}estado, '')",
+    "especialidade": "COALESCE({p}especialidade, '')",
+    "status_consulta": "COALESCE({p}status_consulta, '')",
+    "sexo_paciente": "COALESCE({p}sexo_paciente, '')",
+    "receita_medicacao": "COALESCE({p}receita_medicacao, '')",
+}
+
+# Medida -> coluna de origem. Para cada uma guardamos n_, soma_ e soma_quadrado_
+MEDIDAS_RESUMO = {
+    "valor": "valor_consulta",
+    "idade": "idade_paciente",
+    "espera": "tempo_espera_min",
+    "satisfacao": "satisfacao_paciente",
+}
+
+def _colunas_medidas():
+    colunas = ["consultas"]
+    for medida in MEDIDAS_RESUMO:
+        colunas += [f"n_{medida}", f"soma_{medida}", f"soma_quadrado_{medida}"]
+    return colunas
+
+def _expressoes_medidas(p, agregar=False):
+    """Valores das medidas para uma linha (p = 'NEW.'/'OLD.') ou agregados (GROUP BY)."""
+    expressoes = ["COUNT(*)" if agregar else "1"]
+    for coluna in MEDIDAS_RESUMO.values():
+        origem = f"{p}{coluna}"
+        if agregar:
+            expressoes += [f"COUNT({origem})", f"TOTAL({origem})", f"TOTAL({origem} * {origem})"]
+        else:
+            expressoes += [
+                f"({origem} IS NOT NULL)",
+                f"COALESCE({origem}, 0)",
+                f"COALESCE({origem} * {origem}, 0)",
+            ]
+    return expressoes
+
+def _sql_somar_resumo(p, sinal="+"):
+    """UPSERT que soma (ou subtrai) uma linha de consultas no resumo."""
+    chaves = list(CHAVES_RESUMO)
+    colunas = _colunas_medidas()
+    valores = [e.format(p=p) for e in CHAVES_RESUMO.values()] + _expressoes_medidas(p)
+    atualizacao = ", ".join(f"{c} = {c} + excluded.{c}" for c in colunas)
+    if sinal == "-":
+        # Subtrair = somar os valores negados (que também são o que fica
+        # gravado caso a linha ainda não exista)
+        valores = valores[:len(chaves)] + [f"-({v})" for v in valores[len(chaves):]]
+    return f"""
+    INSERT INTO consultas_resumo ({", ".join(chaves + colunas)})
+    VALUES ({", ".join(valores)})
+    ON CONFLICT({", ".join(chaves)}) DO UPDATE SET {atualizacao};
+    """
+
+SQL_LIMPAR_RESUMO_VAZIO = "DELETE FROM consultas_resumo WHERE consultas <= 0;"
+
+GATILHOS_RESUMO = {
+    "trg_resumo_insert": f"""
+    CREATE TRIGGER IF NOT EXISTS trg_resumo_insert AFTER INSERT ON consultas
+    BEGIN {_sql_somar_resumo("NEW.")} END
+    """,
+    "trg_resumo_delete": f"""
+    CREATE TRIGGER IF NOT EXISTS trg_resumo_delete AFTER DELETE ON consultas
+    BEGIN {_sql_somar_resumo("OLD.", "-")} {SQL_LIMPAR_RESUMO_VAZIO} END
+    """,
+    "trg_resumo_update": f"""
+    CREATE TRIGGER IF NOT EXISTS trg_resumo_update AFTER UPDATE ON consultas
+    BEGIN {_sql_somar_resumo("OLD.", "-")} {_sql_somar_resumo("NEW.")} {SQL_LIMPAR_RESUMO_VAZIO} END
+    """,
+}
+
+def sql_agregar_resumo(condicao=""):
+    """SELECT que calcula o resumo direto de consultas (reconstrução e verificação)."""
+    chaves = [e.format(p="") for e in CHAVES_RESUMO.values()]
+    selecao = [f"{e} AS {c}" for c, e in zip(CHAVES_RESUMO, chaves)]
+    selecao += [f"{e} AS {c}" for c, e in zip(_colunas_medidas(), _expressoes_medidas("", agregar=True))]
+    where = f"WHERE {condicao}" if condicao else ""
+    return f"SELECT {', '.join(selecao)} FROM consultas {where} GROUP BY {', '.join(chaves)}"
+
+def criar_gatilhos_resumo(cursor):
+    for sql in GATILHOS_RESUMO.values():
+        cursor.execute(sql)
+
+def remover_gatilhos_resumo(cursor):
+    for nome in GATILHOS_RESUMO:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {nome}")
+
+def acumular_resumo(cursor, id_minimo=0):
+    """Soma ao resumo as consultas com id_consulta > id_minimo (usado em cargas em lote)."""
+    colunas = list(CHAVES_RESUMO) + _colunas_medidas()
+    atualizacao = ", ".join(f"{c} = {c} + excluded.{c}" for c in _colunas_medidas())
+    # "WHERE true" desfaz a ambiguidade entre o ON do upsert e um JOIN
+    cursor.execute(f"""
+    INSERT INTO consultas_resumo ({", ".join(colunas)})
+    SELECT * FROM ({sql_agregar_resumo("id_consulta > ?")}) WHERE true
+    ON CONFLICT({", ".join(CHAVES_RESUMO)}) DO UPDATE SET {atualizacao}
+    """, (id_minimo,))
+
+def _migracao_3(cursor):
+    chaves = [f"{c} {'INTEGER' if c == 'ano_mes' else 'TEXT'} NOT NULL" for c in CHAVES_RESUMO]
+    medidas = [f"{c} {'INTEGER' if c == 'consultas' or c.startswith('n_') else 'REAL'} NOT NULL DEFAULT 0"
+               for c in _colunas_medidas()]
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS consultas_resumo (
+        {", ".join(chaves + medidas)},
+        PRIMARY KEY ({", ".join(CHAVES_RESUMO)})
+    )
+    """)
+    cursor.execute("DELETE FROM consultas_resumo")
+    acumular_resumo(cursor)
+    criar_gatilhos_resumo(cursor)
+
+def _migracao_4(cursor):
+    # Chave natural (paciente, médico, data) usada para não duplicar linhas
+    # na sincronização incremental do CSV
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_consultas_chave_natural
+    ON consultas (id_paciente, id_medico, data_consulta)
+    """)
+    # Estado da sincronização por arquivo: impressão digital do início do
+    # arquivo e a posição (em bytes) até onde ele já foi importado
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS sincronizacao_csv (
+        arquivo TEXT PRIMARY KEY,
+        impressao TEXT NOT NULL,
+        bytes_impressao INTEGER NOT NULL,
+        posicao INTEGER NOT NULL,
+        linhas INTEGER NOT NULL,
+        atualizado_em TEXT NOT NULL
+    )
+    """)
+
+def _migracao_5(cursor):
+    # Amostra estratificada (ano_mes x estado x especialidade) para a prévia
+    # rápida do dashboard. `populacao` é o tamanho do estrato em consultas;
+    # amostra_versoes guarda a versão (versoes_dados) de cada mês amostrado.
+    # O conteúdo é gerado por amostra.atualizar_amostra.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS consultas_amostra (
+        id_consulta INTEGER PRIMARY KEY,
+        ano_mes INTEGER NOT NULL,
+        estado TEXT,
+        especialidade TEXT,
+        status_consulta TEXT,
+        sexo_paciente TEXT,
+        receita_medicacao TEXT,
+        idade_paciente INTEGER,
+        valor_consulta REAL,
+        tempo_espera_min INTEGER,
+        satisfacao_paciente REAL,
+        populacao INTEGER NOT NULL
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_amostra_ano_mes ON consultas_amostra (ano_mes)")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS amostra_versoes (
+        ano_mes INTEGER PRIMARY KEY,
+        versao INTEGER NOT NULL
+    )
+    """)
+
+MIGRACOES = [
+    (1, _migracao_1),
+    (2, _migracao_2),
+    (3, _migracao_3),
+    (4, _migracao_4),
+    (5, _migracao_5),
+]
+
+def versao_esquema(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrar_banco():
+    """Aplica as migrações pendentes. Pode ser chamada várias vezes (idempotente)."""
+    conn = create_connection()
+    try:
+        for versao, migracao in MIGRACOES:
+            if versao_esquema(conn) >= versao:
+                continue
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # Outro processo pode ter migrado enquanto esperávamos o lock
+                if versao_esquema(conn) < versao:
+                    migracao(cursor)
+                    cursor.execute(f"PRAGMA user_version = {versao}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.close()
@@ -0,0 +1,73 @@
+import pandas as pd
+
+# =========================================================
+# Esquema da tabela consultas
+# =========================================================
+# Para cada coluna: (tipo na leitura do CSV, tipo em memória no dashboard).
+# O importador do CSV e o carregamento do banco usam a mesma definição.
+# Em memória, colunas de baixa cardinalidade viram category e os inteiros
+# usam o menor tipo nullable que comporta os valores esperados.
+
+ESQUEMA_CONSULTAS = {
+    "id_consulta":         ("Int64",   "Int32"),
+    "id_paciente":         ("Int64",   "Int32"),
+    "id_medico":           ("Int64",   "Int32"),
+    "data_consulta":       ("string",  "datetime64[ns]"),
+    "estado":              ("string",  "category"),
+    "cidade":              ("string",  "category"),
+    "especialidade":       ("string",  "category"),
+    "idade_paciente":      ("Int64",   "Int8"),
+    "sexo_paciente":       ("string",  "category"),
+    "valor_consulta":      ("float64", "float64"),
+    "forma_pagamento":     ("string",  "category"),
+    "tempo_espera_min":    ("Int64",   "Int16"),
+    "satisfacao_paciente": ("float64", "Float32"),
+    "receita_medicacao":   ("string",  "category"),
+    "status_consulta":     ("string",  "category"),
+}
+
+def tipos_csv(colunas=None):
+    """Dicionário de dtypes para o pd.read_csv."""
+    colunas = colunas or ESQUEMA_CONSULTAS.keys()
+    return {c: ESQUEMA_CONSULTAS[c][0] for c in colunas}
+
+def uso_memoria(df):
+    """Bytes ocupados pelo DataFrame, incluindo o conteúdo das strings."""
+    return int(df.memory_usage(deep=True).sum())
+
+def aplicar_esquema(df):
+    """
+    Converte as colunas conhecidas para o tipo compacto do esquema.
+
+    Se um valor não couber no tipo reduzido (ex.: idade acima de 127),
+    a coluna fica no tipo largo em vez de estourar. O consumo antes e
+    depois fica em df.attrs["memoria"].
+    """
+    antes = uso_memoria(df)
+    tipado = df.copy()
+    for coluna in tipado.columns:
+        if coluna not in ESQUEMA_CONSULTAS:
+            continue
+        tipo = ESQUEMA_CONSULTAS[coluna][1]
+        if tipo.startswith("datetime"):
+            tipado[coluna] = pd.to_datetime(tipado[coluna], errors="coerce")
+            continue
+        try:
+            tipado[coluna] = tipado[coluna].astype(tipo)
+        except (TypeError, ValueError, OverflowError):
+            largo = ESQUEMA_CONSULTAS[coluna][0]
+            tipado[coluna] = tipado[coluna].astype(largo)
+
+    tipado.attrs["memoria"] = {"antes": antes, "depois": uso_memoria(tipado)}
+    return tipado
+
+def relatorio_memoria(df):
+    """Texto com o consumo antes/depois da tipagem (quando disponível)."""
+    memoria = df.attrs.get("memoria")
+    if not memoria:
+        return f"{uso_memoria(df) / 1e6:.1f} MB"
+    reducao = 1 - memoria["depois"] / memoria["antes"] if memoria["antes"] else 0
+    return (
+        f"{memoria['antes'] / 1e6:.1f} MB → {memoria['depois'] / 1e6:.1f} MB "
+        f"({reducao:.0%} menor)"
+    )
@@ -0,0 +1,160 @@
+import atexit
+import itertools
+import queue
+import threading
+from collections import OrderedDict, namedtuple
+
+import crud
+from perfil import medir
+
+# =========================================================
+# Fila de escrita em segundo plano (um único escritor)
+# =========================================================
+# Os formulários do app não gravam direto no SQLite: enviar() coloca a
+# escrita numa fila limitada e devolve na hora um ID de escrita. Uma thread
+# escritora tira da fila tudo o que estiver pendente e grava em um único
+# commit (group commit), com um SAVEPOINT por escrita: uma escrita inválida
+# falha sozinha sem derrubar as outras do grupo.
+#
+# O estado de cada ID (pendente, gravada ou falhou) fica disponível em
+# status(); aguardar() bloqueia até as escritas indicadas terminarem, o que
+# garante que a sessão que escreveu leia os próprios dados em seguida. A
+# versão dos dados (crud.versao_dados) muda no mesmo commit, então o cache
+# das leituras é invalidado junto.
+
+CAPACIDADE_FILA = 1000
+MAXIMO_GRUPO = 500
+MAXIMO_ESTADOS = 10_000
+
+PENDENTE = "pendente"
+GRAVADA = "gravada"
+FALHOU = "falhou"
+
+Escrita = namedtuple("Escrita", ["id", "operacao", "item"])
+
+def _aplicar(conn, escrita):
+    try:
+        return crud.OPERACOES_ESCRITA[escrita.operacao](conn, escrita.item)
+    except TypeError as erro:
+        # Item malformado: falha só esta escrita (o lote trata ValueError por linha)
+        raise ValueError(f"escrita inválida: {erro}") from erro
+
+class FilaEscrita:
+    def __init__(self, capacidade=CAPACIDADE_FILA, maximo_grupo=MAXIMO_GRUPO):
+        self.maximo_grupo = maximo_grupo
+        self._fila = queue.Queue(maxsize=capacidade)
+        self._ids = itertools.count(1)
+        self._estados = OrderedDict()
+        self._condicao = threading.Condition()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.grupos = 0
+        self.escritas = 0
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name="fila-escrita", daemon=True)
+                self._thread.start()
+
+    def enviar(self, operacao, item, timeout=5):
+        """
+        Enfileira uma escrita ("inserir", "atualizar" ou "excluir", com o item
+        no formato de crud.OPERACOES_ESCRITA) e devolve o ID dela. Com a fila
+        cheia por mais de `timeout` segundos, levanta RuntimeError.
+        """
+        if operacao not in crud.OPERACOES_ESCRITA:
+            raise ValueError(f"Operação inválida: {operacao}")
+        self._iniciar()
+        with self._condicao:
+            id_escrita = next(self._ids)
+            self._estados[id_escrita] = {"estado": PENDENTE, "erro": None}
+            while len(self._estados) > MAXIMO_ESTADOS:
+                self._estados.popitem(last=False)
+        try:
+            self._fila.put(Escrita(id_escrita, operacao, item), timeout=timeout)
+        except queue.Full:
+            self._concluir({id_escrita: (FALHOU, "fila de escrita cheia")})
+            raise RuntimeError("Fila de escrita cheia; tente novamente em instantes.") from None
+        return id_escrita
+
+    def status(self, id_escrita):
+        """{"estado": pendente|gravada|falhou, "erro": mensagem} ou None se desconhecido."""
+        with self._condicao:
+            estado = self._estados.get(id_escrita)
+            return dict(estado) if estado else None
+
+    def aguardar(self, ids, timeout=None):
+        """Espera as escritas `ids` terminarem. Retorna False se o prazo acabar antes."""
+        with self._condicao:
+            return self._condicao.wait_for(
+                lambda: all(self._estados.get(i, {}).get("estado") != PENDENTE for i in ids),
+                timeout=timeout,
+            )
+
+    def pendentes(self):
+        return self._fila.qsize()
+
+    def _concluir(self, resultados):
+        with self._condicao:
+            for id_escrita, (estado, erro) in resultados.items():
+                if id_escrita in self._estados:
+                    self._estados[id_escrita] = {"estado": estado, "erro": erro}
+            self._condicao.notify_all()
+
+    # ----------------------------
+    # Thread escritora
+    def _executar(self):
+        while True:
+            grupo = [self._fila.get()]
+            # Tudo o que chegou enquanto o último commit rodava entra neste grupo
+            while len(grupo) < self.maximo_grupo:
+                try:
+                    grupo.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            parar = None in grupo
+            grupo = [escrita for escrita in grupo if escrita is not None]
+            if grupo:
+                self._gravar(grupo)
+            if parar:
+                return
+
+    def _gravar(self, grupo):
+        """Grava o grupo em um commit; falhas isoladas voltam com a mensagem."""
+        with medir("fila_escrita.grupo") as medicao:
+            try:
+                resultado = crud._executar_lote(grupo, _aplicar, tudo_ou_nada=False)
+                falhas = {grupo[posicao].id: mensagem for posicao, mensagem in resultado["falhas"]}
+            except Exception as erro:
+                # O grupo foi desfeito (ex.: banco travado no commit): nada foi
+                # gravado. A thread continua viva para os próximos grupos.
+                falhas = {escrita.id: str(erro) for escrita in grupo}
+            if medicao is not None:
+                medicao["linhas"] = len(grupo)
+        self.grupos += 1
+        self.escritas += len(grupo)
+        self._concluir({
+            escrita.id: (FALHOU, falhas[escrita.id]) if escrita.id in falhas else (GRAVADA, None)
+            for escrita in grupo
+        })
+
+    def encerrar(self, timeout=10):
+        """Grava o que estiver na fila e para a thread escritora."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._fila.put(None)
+            thread.join(timeout)
+
+fila_escrita = FilaEscrita()
+atexit.register(fila_escrita.encerrar)
+
+def enviar(operacao, item):
+    return fila_escrita.enviar(operacao, item)
+
+def status(id_escrita):
+    return fila_escrita.status(id_escrita)
+
+def aguardar(ids, timeout=None):
+    return fila_escrita.aguardar(ids, timeout)
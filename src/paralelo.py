@@ -0,0 +1,188 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import analise
+import crud
+import database
+
+# =========================================================
+# Agregação paralela por partição (ano/mês ou estado)
+# =========================================================
+# As linhas filtradas são divididas por ano_mes (ou estado) e cada grupo de
+# partições é agregado num processo separado. Cada processo devolve
+# parciais somáveis, no mesmo formato da tabela consultas_resumo: contagem,
+# n_, soma_ e soma_quadrado_ de cada medida. Para o tempo de espera os
+# parciais são histogramas exatos (a espera é inteira), que também se
+# somam e servem de sketch de quantis para o boxplot.
+#
+# O processo principal soma os parciais e calcula as métricas finais; o
+# resultado tem o mesmo formato dos outros backends de analise:
+#
+#   analise.calcular_dashboard(filtros, backend="paralelo", processos=4)
+
+CHAVES_PARTICAO = ("ano_mes", "estado")
+
+# Colunas lidas por partição (receita_sim já vem calculada do SQLite)
+SQL_COLUNAS = """
+ano_mes, estado, especialidade, status_consulta, sexo_paciente, receita_medicacao,
+idade_paciente, valor_consulta, tempo_espera_min, satisfacao_paciente,
+(receita_medicacao = 'Sim') AS receita_sim
+"""
+
+_executor = None
+_executor_processos = None
+_executor_lock = threading.Lock()
+
+def _obter_executor(processos):
+    """Pool de processos reaproveitado entre chamadas (criar processos é caro)."""
+    global _executor, _executor_processos
+    with _executor_lock:
+        if _executor is None or _executor_processos != processos:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            # spawn: o Streamlit roda em várias threads, e fork com threads é inseguro
+            _executor = ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context("spawn"))
+            _executor_processos = processos
+        return _executor
+
+def encerrar():
+    """Encerra o pool de processos (recriado sob demanda)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+# =========================================================
+# Parciais (rodam nos processos filhos)
+# =========================================================
+def _parciais_df(df, intermediarios):
+    """Parciais somáveis de cada intermediário sobre um pedaço das linhas."""
+    parciais = {}
+    for nome in intermediarios:
+        dimensoes, _ = analise.INTERMEDIARIOS[nome]
+        chaves = ["ano_mes" if d == "mes" else d for d in dimensoes]
+        if nome.startswith("hist_"):
+            parciais[nome] = (
+                df.dropna(subset=chaves).groupby(chaves, sort=False).size().reset_index(name="consultas")
+            )
+            continue
+        colunas = {"consultas": ("receita_sim", "size"), "receitas": ("receita_sim", "sum")}
+        for medida, origem in database.MEDIDAS_RESUMO.items():
+            colunas[f"n_{medida}"] = (origem, "count")
+            colunas[f"soma_{medida}"] = (origem, "sum")
+            colunas[f"soma_quadrado_{medida}"] = (f"{origem}_quadrado", "sum")
+        quadrados = {f"{origem}_quadrado": df[origem] ** 2 for origem in database.MEDIDAS_RESUMO.values()}
+        parciais[nome] = (
+            df.assign(**quadrados).groupby(chaves, sort=False).agg(**colunas).reset_index()
+        )
+    return parciais
+
+def _agregar_particoes(caminho, filtros, chave, valores, intermediarios):
+    """Tarefa de um processo: lê as partições `valores` e devolve os parciais."""
+    condicoes, parametros = crud.montar_filtros(filtros)
+    presentes = [valor for valor in valores if valor is not None]
+    particao = [f"{chave} IN ({', '.join('?' * len(presentes))})"] if presentes else []
+    if len(presentes) < len(valores):
+        particao.append(f"{chave} IS NULL")
+    condicoes.append(f"({' OR '.join(particao)})")
+    sql = f"SELECT {SQL_COLUNAS} FROM consultas {crud._clausula_where(condicoes)}"
+    conn = database.create_connection(caminho, somente_leitura=True)
+    try:
+        df = pd.read_sql_query(sql, conn, params=list(parametros) + presentes)
+    finally:
+        conn.close()
+    return _parciais_df(df, intermediarios)
+
+# =========================================================
+# Junção dos parciais (processo principal)
+# =========================================================
+def _media(soma, n):
+    return soma.where(n > 0) / n.where(n > 0)
+
+def combinar_parciais(nome, parciais):
+    """Soma os parciais de um intermediário e calcula as métricas dos gráficos."""
+    dimensoes, metricas = analise.INTERMEDIARIOS[nome]
+    chaves = ["ano_mes" if d == "mes" else d for d in dimensoes]
+    total = pd.concat(parciais, ignore_index=True).groupby(chaves, sort=True).sum().reset_index()
+    if "ano_mes" in chaves and "mes" in dimensoes:
+        total["mes"] = [f"{v // 100:04d}-{v % 100:02d}" for v in total["ano_mes"].astype("int64")]
+    if nome.startswith("hist_"):
+        return total[dimensoes + ["consultas"]]
+    total["receita"] = total["soma_valor"].where(total["n_valor"] > 0)
+    total["idade_media"] = _media(total["soma_idade"], total["n_idade"])
+    total["satisfacao_media"] = _media(total["soma_satisfacao"], total["n_satisfacao"])
+    total["espera_media"] = _media(total["soma_espera"], total["n_espera"])
+    return total[dimensoes + metricas]
+
+def _dividir(contagens, partes):
+    """Distribui as partições em `partes` grupos de tamanho parecido (maior primeiro)."""
+    grupos = [[] for _ in range(partes)]
+    cargas = np.zeros(partes)
+    for valor, linhas in sorted(contagens.items(), key=lambda item: -item[1]):
+        destino = int(cargas.argmin())
+        grupos[destino].append(valor)
+        cargas[destino] += linhas
+    return [grupo for grupo in grupos if grupo]
+
+def agregar_em_paralelo(filtros, intermediarios, processos=None, particionar_por="ano_mes"):
+    """Intermediários agregados em `processos` processos. Retorna {nome: DataFrame}."""
+    if particionar_por not in CHAVES_PARTICAO:
+        raise ValueError(f"Partição inválida: {particionar_por}")
+    processos = processos or os.cpu_count() or 1
+    # Tamanho de cada partição pelo resumo mensal (não lê a tabela consultas)
+    contagens = crud.agregar_consultas(filtros, [particionar_por], ["consultas"])
+    contagens = dict(zip(contagens[particionar_por], contagens["consultas"]))
+    # agregar_consultas descarta a chave nula (consultas sem data ou sem
+    # estado), mas elas entram nos gráficos de outras dimensões: viram a
+    # partição None, lida com "chave IS NULL"
+    condicoes, parametros = crud.montar_filtros(filtros)
+    condicoes.append(f"{particionar_por} IS NULL")
+    with database.conexao(somente_leitura=True) as conn:
+        nulas = conn.execute(
+            f"SELECT COUNT(*) FROM consultas {crud._clausula_where(condicoes)}", parametros
+        ).fetchone()[0]
+    if nulas or not contagens:
+        contagens[None] = nulas
+
+    # Alguns grupos a mais que processos equilibram partições de tamanhos diferentes
+    grupos = _dividir(contagens, min(len(contagens), processos * 2))
+    tarefas = [(database.DB_PATH, filtros, particionar_por, grupo, list(intermediarios)) for grupo in grupos]
+    if processos == 1:
+        resultados = [_agregar_particoes(*tarefa) for tarefa in tarefas]
+    else:
+        executor = _obter_executor(processos)
+        resultados = list(executor.map(_agregar_particoes, *zip(*tarefas)))
+    return {
+        nome: combinar_parciais(nome, [parcial[nome] for parcial in resultados])
+        for nome in intermediarios
+    }
+
+# =========================================================
+# Backend do motor analítico
+# =========================================================
+def criar_backend(filtros, limite_amostra=analise.LIMITE_AMOSTRA, processos=None, particionar_por="ano_mes"):
+    """Backend "paralelo": agregações em processos; linhas brutas e amostra continuam no SQLite."""
+    sql = analise.BACKENDS["sql"](filtros, limite_amostra=limite_amostra)
+    calculados = {}
+
+    def preparar(origens):
+        # Todos os intermediários agregados da chamada numa única passada por partição
+        pendentes = [o for o in origens if o in analise.INTERMEDIARIOS and o not in calculados]
+        if pendentes:
+            calculados.update(agregar_em_paralelo(filtros, pendentes, processos, particionar_por))
+
+    def calcular(nome):
+        if nome not in analise.INTERMEDIARIOS:
+            return sql(nome)
+        if nome not in calculados:
+            preparar([nome])
+        return calculados[nome]
+
+    calcular.preparar = preparar
+    return calcular
@@ -0,0 +1,146 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+# =========================================================
+# Instrumentação opcional (perfil de tempo)
+# =========================================================
+# Mede funções do crud, comandos SQL (com nº de linhas) e os blocos de
+# gráficos do app. Desligada por padrão: nesse caso medir() devolve um
+# contexto vazio compartilhado e as funções decoradas só testam uma flag.
+# Liga com DASHBOARD_SAUDE_PERFIL=1 ou pelo painel de depuração do app.
+#
+# Cada seção guarda as últimas N durações (p50/p95 entre reruns) e os
+# eventos recentes podem ser exportados no formato Chrome Trace, que abre
+# em chrome://tracing ou https://ui.perfetto.dev.
+
+JANELA_DURACOES = 200
+MAXIMO_EVENTOS = 20_000
+ARQUIVO_TRACE = os.environ.get("DASHBOARD_SAUDE_TRACE", "perfil_trace.json")
+
+_NULO = nullcontext()
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+class Perfilador:
+    def __init__(self, ativo=False, janela=JANELA_DURACOES, maximo_eventos=MAXIMO_EVENTOS):
+        self.ativo = ativo
+        self.janela = janela
+        self._duracoes = defaultdict(lambda: deque(maxlen=self.janela))
+        self._linhas = defaultdict(int)
+        self._chamadas = defaultdict(int)
+        self._eventos = deque(maxlen=maximo_eventos)
+        self._inicio = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def registrar(self, nome, inicio, segundos, linhas=None, detalhe=None):
+        """Guarda uma medição; `inicio` é um time.perf_counter()."""
+        with self._lock:
+            self._duracoes[nome].append(segundos)
+            self._chamadas[nome] += 1
+            if linhas is not None and linhas >= 0:
+                self._linhas[nome] += linhas
+            self._eventos.append((nome, inicio, segundos, linhas, detalhe, threading.get_ident()))
+
+    @contextmanager
+    def _medir(self, nome, detalhe):
+        inicio = time.perf_counter()
+        medicao = {"linhas": None}
+        try:
+            yield medicao
+        finally:
+            self.registrar(nome, inicio, time.perf_counter() - inicio, medicao["linhas"], detalhe)
+
+    def medir(self, nome, detalhe=None):
+        """
+        Bloco medido. O dicionário devolvido pelo `with ... as m` aceita
+        m["linhas"] = n para registrar quantas linhas a seção produziu.
+        """
+        if not self.ativo:
+            return _NULO
+        return self._medir(nome, detalhe)
+
+    def resumo(self):
+        """Uma linha por seção: chamadas, p50/p95/última (ms) e linhas."""
+        with self._lock:
+            linhas = []
+            for nome, duracoes in self._duracoes.items():
+                linhas.append({
+                    "secao": nome,
+                    "chamadas": self._chamadas[nome],
+                    "p50_ms": _percentil(duracoes, 0.50) * 1000,
+                    "p95_ms": _percentil(duracoes, 0.95) * 1000,
+                    "ultima_ms": duracoes[-1] * 1000,
+                    "total_ms": sum(duracoes) * 1000,
+                    "linhas": self._linhas.get(nome),
+                })
+        return sorted(linhas, key=lambda linha: linha["total_ms"], reverse=True)
+
+    def eventos_recentes(self, desde=None):
+        """Eventos (nome, início, duração, linhas, detalhe, thread) iniciados a partir de `desde` (perf_counter)."""
+        with self._lock:
+            eventos = list(self._eventos)
+        if desde is not None:
+            eventos = [e for e in eventos if e[1] >= desde]
+        return eventos
+
+    def exportar(self, caminho=ARQUIVO_TRACE):
+        """Grava os eventos guardados em JSON (Chrome Trace). Retorna o nº de eventos."""
+        eventos = self.eventos_recentes()
+        trace = []
+        for nome, inicio, duracao, linhas, detalhe, thread in eventos:
+            argumentos = {}
+            if linhas is not None:
+                argumentos["linhas"] = linhas
+            if detalhe:
+                argumentos["detalhe"] = detalhe
+            trace.append({
+                "name": nome, "cat": nome.split(".", 1)[0], "ph": "X",
+                "ts": (inicio - self._inicio) * 1e6, "dur": duracao * 1e6,
+                "pid": os.getpid(), "tid": thread, "args": argumentos,
+            })
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, arquivo)
+        return len(trace)
+
+    def limpar(self):
+        with self._lock:
+            self._duracoes.clear()
+            self._linhas.clear()
+            self._chamadas.clear()
+            self._eventos.clear()
+
+perfilador = Perfilador(ativo=os.environ.get("DASHBOARD_SAUDE_PERFIL") == "1")
+
+def medir(nome, detalhe=None):
+    return perfilador.medir(nome, detalhe)
+
+def cronometrar(func=None, nome=None):
+    """Decorador: mede cada chamada da função quando o perfil está ligado."""
+    if func is None:
+        return lambda f: cronometrar(f, nome)
+    nome = nome or f"{func.__module__}.{func.__name__}"
+
+    @wraps(func)
+    def envolvida(*args, **kwargs):
+        if not perfilador.ativo:
+            return func(*args, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            perfilador.registrar(nome, inicio, time.perf_counter() - inicio)
+    return envolvida
+
+def rotulo_sql(sql):
+    """Nome curto e estável para agrupar um comando SQL (sem os parâmetros)."""
+    sql = re.sub(r"\s+", " ", sql).strip()
+    sql = re.sub(r"\(\?(, \?)*\)", "(?…)", sql)  # listas IN de tamanhos diferentes
+    return "sql." + (sql[:90] + "…" if len(sql) > 90 else sql)
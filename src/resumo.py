@@ -0,0 +1,60 @@
+import argparse
+
+from database import (
+    CHAVES_RESUMO, _colunas_medidas, acumular_resumo, conexao, create_table, sql_agregar_resumo
+)
+
+# =========================================================
+# Manutenção da tabela de resumo (consultas_resumo)
+# =========================================================
+# Em operação normal o resumo é mantido pelos gatilhos criados na
+# migração 3. Estas funções servem para reconstruí-lo do zero e para
+# conferir se ele bate com a tabela consultas.
+#
+#   python src/resumo.py verificar
+#   python src/resumo.py reconstruir
+
+def reconstruir_resumo():
+    """Recalcula o resumo inteiro a partir de consultas. Retorna o nº de linhas."""
+    with conexao() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("DELETE FROM consultas_resumo")
+        acumular_resumo(cursor)
+        return cursor.execute("SELECT COUNT(*) FROM consultas_resumo").fetchone()[0]
+
+def verificar_resumo(casas_decimais=6):
+    """
+    Compara o resumo com uma agregação feita na hora sobre consultas.
+    Retorna a lista de chaves (grupos) divergentes; vazia se estiver tudo certo.
+    """
+    colunas = list(CHAVES_RESUMO) + [
+        c if c == "consultas" or c.startswith("n_") else f"ROUND({c}, {casas_decimais}) AS {c}"
+        for c in _colunas_medidas()
+    ]
+    selecao = ", ".join(colunas)
+    chaves = ", ".join(CHAVES_RESUMO)
+    sql = f"""
+    WITH esperado AS ({sql_agregar_resumo()}),
+         atual AS (SELECT * FROM consultas_resumo),
+         faltando AS (SELECT {selecao} FROM esperado EXCEPT SELECT {selecao} FROM atual),
+         sobrando AS (SELECT {selecao} FROM atual EXCEPT SELECT {selecao} FROM esperado)
+    SELECT {chaves} FROM faltando UNION SELECT {chaves} FROM sobrando
+    """
+    with conexao(somente_leitura=True) as conn:
+        return conn.execute(sql).fetchall()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manutenção da tabela consultas_resumo")
+    parser.add_argument("acao", choices=["verificar", "reconstruir"])
+    args = parser.parse_args()
+
+    create_table()
+    if args.acao == "reconstruir":
+        print(f"Resumo reconstruído: {reconstruir_resumo()} grupos")
+
+    divergencias = verificar_resumo()
+    if divergencias:
+        print(f"❌ {len(divergencias)} grupos divergentes no resumo, por exemplo: {divergencias[:5]}")
+        raise SystemExit(1)
+    print("✅ Resumo consistente com a tabela consultas")
@@ -0,0 +1,39 @@
+import argparse
+
+from crud import CSV_PATH, estado_sincronizacao, sincronizar_csv
+from database import create_table
+
+# =========================================================
+# Sincronização incremental do CSV pela linha de comando
+# =========================================================
+# Importa só as linhas novas do arquivo (ver crud.sincronizar_csv). Pode
+# ser agendada para rodar ao longo do dia enquanto o arquivo cresce; se for
+# interrompida, a próxima execução continua do último lote gravado.
+#
+#   python src/sincronizar.py
+#   python src/sincronizar.py caminho/do/arquivo.csv --lote 20000
+#   python src/sincronizar.py --estado
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sincronização incremental do CSV de consultas")
+    parser.add_argument("caminho", nargs="?", default=CSV_PATH, help="arquivo CSV de origem")
+    parser.add_argument("--lote", type=int, default=50_000, help="linhas por transação")
+    parser.add_argument("--estado", action="store_true", help="só mostra até onde o arquivo já foi lido")
+    args = parser.parse_args()
+
+    create_table()
+    if args.estado:
+        estado = estado_sincronizacao(args.caminho)
+        if estado is None:
+            print("Arquivo ainda não sincronizado")
+        else:
+            print(f"{estado['linhas']} linhas lidas até o byte {estado['posicao']} "
+                  f"(última sincronização: {estado['atualizado_em']})")
+        raise SystemExit(0)
+
+    stats = sincronizar_csv(
+        args.caminho, chunksize=args.lote,
+        progresso=lambda linhas, segundos: print(f"  {linhas} linhas lidas ({segundos:.1f}s)")
+    )
+    print(f"✅ {stats['inseridas']} consultas novas, {stats['duplicadas']} já existentes "
+          f"({stats['linhas']} linhas em {stats['segundos']:.2f}s, retomado do byte {stats['retomado_de']})")
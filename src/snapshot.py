@@ -0,0 +1,199 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+from crud import COLUNAS_INSERCAO, montar_filtros, versoes_por_mes
+from database import conexao
+from esquema import aplicar_esquema
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional (vem junto com o Streamlit)
+    pa = None
+    pq = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: só a trava entre threads do mesmo processo
+    fcntl = None
+
+# =========================================================
+# Snapshot colunar (Parquet particionado por ano/mês)
+# =========================================================
+# Cópia de consultas em data/snapshot/ano=AAAA/mes=MM/dados.parquet. O
+# manifesto guarda a versão (tabela versoes_dados) de cada partição
+# exportada; atualizar_snapshot regrava só as partições cuja versão mudou.
+# A leitura poda partições e colunas pelos filtros e lê com memory map.
+#
+# Conferir se o snapshot está em dia (snapshot_atualizado) só lê o
+# manifesto, versoes_dados e o resumo mensal: sem escrita desde a última
+# exportação, o custo é de milissegundos e nada é regravado.
+#
+# O app e a API podem atualizar a mesma pasta ao mesmo tempo: a atualização
+# roda sob uma trava (entre threads e, com fcntl, entre processos) e cada
+# arquivo é gravado num temporário com nome único antes do os.replace.
+
+PASTA_SNAPSHOT = os.environ.get("DASHBOARD_SAUDE_SNAPSHOT", "data/snapshot")
+ARQUIVO_MANIFESTO = "_manifesto.json"
+ARQUIVO_TRAVA = "_trava"
+
+_trava = threading.Lock()
+
+# Inteiros/floats nulos do Arrow viram tipos nullable do pandas (não float64)
+if pa is not None:
+    TIPOS_PANDAS = {
+        pa.int8(): pd.Int8Dtype(),
+        pa.int16(): pd.Int16Dtype(),
+        pa.int32(): pd.Int32Dtype(),
+        pa.int64(): pd.Int64Dtype(),
+        pa.float32(): pd.Float32Dtype(),
+    }
+
+def snapshot_disponivel():
+    return pa is not None
+
+def _pasta_particao(pasta, ano_mes):
+    return os.path.join(pasta, f"ano={ano_mes // 100}", f"mes={ano_mes % 100}")
+
+def _ler_manifesto(pasta):
+    try:
+        with open(os.path.join(pasta, ARQUIVO_MANIFESTO), encoding="utf-8") as arquivo:
+            return {int(k): v for k, v in json.load(arquivo).items()}
+    except FileNotFoundError:
+        return {}
+
+@contextmanager
+def _travar(pasta):
+    """Uma atualização por vez na pasta, entre threads e entre processos."""
+    with _trava:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(pasta, ARQUIVO_TRAVA), "a") as arquivo:
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+def _substituir(caminho, gravar):
+    """
+    Grava via gravar(temporario) e troca: leitores nunca veem arquivo pela
+    metade. O ponto no início esconde o temporário da leitura do pyarrow.
+    """
+    pasta, nome = os.path.split(caminho)
+    descritor, temporario = tempfile.mkstemp(prefix=f".{nome}.", suffix=".tmp", dir=pasta)
+    os.close(descritor)
+    try:
+        gravar(temporario)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+def _gravar_manifesto(pasta, manifesto):
+    def gravar(temporario):
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump({str(k): v for k, v in sorted(manifesto.items())}, arquivo)
+    _substituir(os.path.join(pasta, ARQUIVO_MANIFESTO), gravar)
+
+def _gravar_particao(pasta, ano_mes, df):
+    destino = _pasta_particao(pasta, ano_mes)
+    os.makedirs(destino, exist_ok=True)
+    tabela = pa.Table.from_pandas(aplicar_esquema(df), preserve_index=False)
+    _substituir(
+        os.path.join(destino, "dados.parquet"),
+        lambda temporario: pq.write_table(tabela, temporario, compression="zstd"),
+    )
+
+def snapshot_atualizado(pasta=PASTA_SNAPSHOT):
+    """True se o manifesto tem a versão atual de todos os meses (e nenhum mês a mais)."""
+    if not os.path.exists(os.path.join(pasta, ARQUIVO_MANIFESTO)):
+        return False
+    with conexao(somente_leitura=True) as conn:
+        atuais = versoes_por_mes(conn)
+    return _ler_manifesto(pasta) == atuais
+
+def atualizar_snapshot(pasta=PASTA_SNAPSHOT, completo=False):
+    """
+    Exporta as partições novas ou alteradas desde o último snapshot.
+    Retorna a lista de ano_mes regravados. Consultas sem data ficam em ano=0/mes=0.
+    """
+    if not snapshot_disponivel():
+        raise RuntimeError("pyarrow não está instalado: snapshot Parquet indisponível")
+    if not completo and snapshot_atualizado(pasta):
+        return []
+
+    os.makedirs(pasta, exist_ok=True)
+    with _travar(pasta):
+        manifesto = {} if completo else _ler_manifesto(pasta)
+        colunas = ["id_consulta", *COLUNAS_INSERCAO]
+        regravadas = []
+
+        with conexao(somente_leitura=True) as conn:
+            # Uma única transação de leitura: versões e linhas vêm do mesmo instante
+            conn.execute("BEGIN")
+            atuais = versoes_por_mes(conn)
+
+            for ano_mes, versao in sorted(atuais.items()):
+                if manifesto.get(ano_mes) == versao:
+                    continue
+                condicao = "ano_mes IS NULL" if ano_mes == 0 else "ano_mes = ?"
+                df = pd.read_sql_query(
+                    f"SELECT {', '.join(colunas)} FROM consultas WHERE {condicao}",
+                    conn, params=[] if ano_mes == 0 else [ano_mes],
+                )
+                _gravar_particao(pasta, ano_mes, df)
+                manifesto[ano_mes] = versao
+                regravadas.append(ano_mes)
+
+        # Partições que não existem mais no banco (todas as consultas excluídas)
+        for ano_mes in set(manifesto) - set(atuais):
+            shutil.rmtree(_pasta_particao(pasta, ano_mes), ignore_errors=True)
+            del manifesto[ano_mes]
+            regravadas.append(ano_mes)
+
+        _gravar_manifesto(pasta, manifesto)
+        return regravadas
+
+def _filtros_parquet(filtros):
+    """Filtros da barra lateral no formato do pyarrow (poda partições e row groups)."""
+    filtros = filtros or {}
+    expressao = []
+    if filtros.get("anos"):
+        expressao.append(("ano", "in", [int(a) for a in filtros["anos"]]))
+    if filtros.get("meses"):
+        expressao.append(("mes", "in", [int(m) for m in filtros["meses"]]))
+    if filtros.get("estados"):
+        expressao.append(("estado", "in", list(filtros["estados"])))
+    if filtros.get("especialidades"):
+        expressao.append(("especialidade", "in", list(filtros["especialidades"])))
+    return expressao or None
+
+def carregar_snapshot(filtros=None, colunas=None, pasta=PASTA_SNAPSHOT):
+    """
+    Lê do snapshot só as partições e colunas necessárias.
+
+    Quando há filtro de ano/mês, as demais partições nem são abertas.
+    Colunas de texto voltam como category (dicionário do Parquet).
+    """
+    if not snapshot_disponivel():
+        raise RuntimeError("pyarrow não está instalado: snapshot Parquet indisponível")
+    if not os.path.exists(os.path.join(pasta, ARQUIVO_MANIFESTO)):
+        atualizar_snapshot(pasta)
+    # montar_filtros valida as chaves da mesma forma que o backend SQL
+    montar_filtros(filtros)
+
+    tabela = pq.read_table(
+        pasta, columns=list(colunas) if colunas else None,
+        filters=_filtros_parquet(filtros), partitioning="hive", memory_map=True,
+    )
+    df = tabela.to_pandas(types_mapper=TIPOS_PANDAS.get, split_blocks=True, self_destruct=True)
+    # Colunas de partição só servem para a poda
+    return df.drop(columns=[c for c in ("ano", "mes") if c in df.columns and c not in (colunas or ())])
@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Os módulos do app ficam em src/ e leem DASHBOARD_SAUDE_DB na importação:
+# aponta para um arquivo temporário antes, para nunca tocar no consultas.db
+os.environ["DASHBOARD_SAUDE_DB"] = os.path.join(tempfile.mkdtemp(), "consultas.db")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import database  # noqa: E402
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """Banco vazio (tabelas, migrações e gatilhos) em um arquivo temporário."""
+    caminho = str(tmp_path / "consultas.db")
+    monkeypatch.setenv("DASHBOARD_SAUDE_DB", caminho)
+    database.configurar_banco(caminho)
+    database.create_table()
+    yield caminho
+    # Fecha os pools para o próximo teste abrir no próprio arquivo
+    database.configurar_banco()
+
+def consulta(data="2024-07-05", estado="SP", especialidade="Cardiologia", valor=100.0,
+             idade=40, satisfacao=4.0, id_paciente=1, id_medico=1, status="realizada"):
+    """Tupla de dados no formato de crud.COLUNAS_INSERCAO."""
+    return (
+        id_paciente, id_medico, data, estado, "Cidade 1", especialidade, idade, "F",
+        valor, "PIX", 15, satisfacao, "Sim", status,
+    )
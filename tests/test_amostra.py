@@ -0,0 +1,26 @@
+import amostra
+import crud
+from conftest import consulta
+from database import conexao
+
+def _desatualizados():
+    with conexao(somente_leitura=True) as conn:
+        return amostra._meses_desatualizados(conn)[1]
+
+def test_amostra_refaz_so_os_meses_alterados(banco):
+    crud.inserir_consultas([consulta(data=f"2024-0{mes}-10", id_paciente=i)
+                            for mes in (1, 2, 3) for i in range(30)])
+    assert amostra.atualizar_amostra() == [202401, 202402, 202403]
+    assert amostra.atualizar_amostra() == []
+    assert _desatualizados() == []
+
+    crud.atualizar_consultas([(1, consulta(data="2024-02-11"))])
+    assert _desatualizados() == [202401, 202402]
+    assert amostra.atualizar_amostra() == [202401, 202402]
+
+    # Mês sem nenhuma consulta: a amostra dele some
+    crud.excluir_consultas(list(range(61, 91)))
+    assert amostra.atualizar_amostra() == [202403]
+    with conexao(somente_leitura=True) as conn:
+        meses = [linha[0] for linha in conn.execute("SELECT DISTINCT ano_mes FROM consultas_amostra ORDER BY 1")]
+    assert meses == [202401, 202402]
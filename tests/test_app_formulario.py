@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+import crud
+from database import conexao
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+from gerar_dados import gerar_csv  # noqa: E402
+
+def test_formulario_de_atualizacao_abre_consulta_com_campos_nulos(banco, tmp_path, monkeypatch):
+    monkeypatch.setattr(crud, "CSV_PATH", gerar_csv(str(tmp_path / "dados.csv"), 50))
+    crud.inicializar_banco()
+    # Linha antiga, gravada antes da validação: só os campos obrigatórios da tabela
+    with conexao() as conn:
+        id_nulo = conn.execute(
+            "INSERT INTO consultas (id_paciente, id_medico, data_consulta, status_consulta) "
+            "VALUES (1, 1, '2024-07-05', 'realizada')"
+        ).lastrowid
+
+    at = AppTest.from_file(os.path.join(RAIZ, "src", "app.py"), default_timeout=120)
+    at.run()
+    at.radio(key="aba").set_value("🗂️ Gestão de Consultas").run()
+    at.number_input(key="update").set_value(id_nulo).run()
+
+    assert not at.exception
+    assert at.selectbox(key=f"upd_estado_{id_nulo}").value is None
+    assert at.selectbox(key=f"upd_especialidade_{id_nulo}").value is None
+
+    # Enviar com os campos vazios não quebra: a validação recusa a escrita
+    next(b for b in at.button if b.label == "Atualizar").click().run()
+    assert not at.exception
@@ -0,0 +1,38 @@
+import json
+import os
+import sys
+
+import pytest
+
+import amostra
+import crud
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+from gerar_dados import gerar_csv  # noqa: E402
+
+def _titulos(at):
+    return [json.loads(grafico.proto.spec)["layout"].get("title", {}).get("text")
+            for grafico in at.get("plotly_chart")]
+
+def test_previa_nao_deixa_graficos_aproximados_na_tela(banco, tmp_path, monkeypatch):
+    monkeypatch.setattr(crud, "CSV_PATH", gerar_csv(str(tmp_path / "dados.csv"), 3000))
+    crud.inicializar_banco()
+    # Sem a amostra em dia o app não desenha a prévia
+    amostra.atualizar_amostra()
+
+    at = AppTest.from_file(os.path.join(RAIZ, "src", "app.py"), default_timeout=120)
+    at.run()
+    exatos = len(_titulos(at))
+
+    next(t for t in at.sidebar.toggle if "Prévia" in t.label).set_value(True).run()
+    # Filtro novo: o exato não está no cache, então a prévia é desenhada antes
+    at.sidebar.multiselect[0].set_value(["SP"]).run()
+
+    assert not at.exception
+    titulos = _titulos(at)
+    assert len(titulos) == exatos
+    assert not [t for t in titulos if t and "(prévia)" in t]
@@ -0,0 +1,40 @@
+import pytest
+
+import crud
+from conftest import consulta
+
+ESTADOS = ["SP", "RJ", "MG"]
+
+@pytest.fixture
+def consultas(banco):
+    """23 consultas com empates no estado e valores nulos (ordenados como -1)."""
+    crud.inserir_consultas([
+        consulta(estado=ESTADOS[i % 3], valor=None if i % 4 == 0 else float(i % 5) * 10)
+        for i in range(23)
+    ])
+    return crud.listar_consultas(tipado=False)
+
+def _percorrer(ordenar_por, decrescente, limite=5):
+    ids, cursor = [], None
+    while True:
+        pagina, cursor = crud.listar_consultas_paginado(
+            limite=limite, ordenar_por=ordenar_por, decrescente=decrescente, apos=cursor
+        )
+        assert len(pagina) <= limite
+        ids += pagina["id_consulta"].tolist()
+        if cursor is None:
+            return ids
+
+@pytest.mark.parametrize("ordenar_por", ["id_consulta", "estado", "valor_consulta"])
+@pytest.mark.parametrize("decrescente", [False, True])
+def test_paginas_cobrem_todas_as_linhas_na_ordem(consultas, ordenar_por, decrescente):
+    ids = _percorrer(ordenar_por, decrescente)
+
+    # Mesma ordem do banco: chave (nulos como -1) e id_consulta como desempate
+    chaves = dict(zip(consultas["id_consulta"], consultas[ordenar_por].fillna(-1)))
+    esperado = sorted(chaves, key=lambda i: (chaves[i], i), reverse=decrescente)
+    assert ids == esperado
+    assert len(set(ids)) == len(consultas)
+
+def test_decrescente_e_o_inverso_do_crescente(consultas):
+    assert _percorrer("estado", True, limite=4) == _percorrer("estado", False, limite=7)[::-1]
@@ -0,0 +1,38 @@
+import crud
+from conftest import consulta
+from resumo import verificar_resumo
+
+DIMENSOES = ["ano_mes", "estado", "especialidade"]
+METRICAS = ["consultas", "receita", "idade_media", "satisfacao_media"]
+
+def _agregados(usar_resumo):
+    return crud.agregar_consultas(None, DIMENSOES, METRICAS, usar_resumo=usar_resumo)
+
+def _confere_resumo():
+    assert verificar_resumo() == []
+    resumo, direto = _agregados(True), _agregados(False)
+    assert resumo[DIMENSOES].equals(direto[DIMENSOES])
+    for metrica in METRICAS:
+        assert (resumo[metrica] - direto[metrica]).abs().max() < 1e-9
+
+def test_resumo_acompanha_insercao_atualizacao_e_exclusao(banco):
+    resultado = crud.inserir_consultas([
+        consulta(),
+        consulta(data="2024-07-20", valor=250.0, satisfacao=None),
+        consulta(data="2024-08-01", estado="RJ", especialidade="Pediatria", idade=8),
+        consulta(data="2025-01-15", especialidade="Neurologia", valor=None),
+    ])
+    assert resultado["sucesso"] == 4
+    _confere_resumo()
+
+    # Troca de mês, estado e especialidade: sai de um grupo e entra em outro
+    crud.atualizar_consultas([
+        (1, consulta(data="2024-09-10", estado="MG", especialidade="Pediatria", valor=80.0)),
+        (4, consulta(data="2025-01-15", especialidade="Neurologia", valor=300.0, satisfacao=2.0)),
+    ])
+    _confere_resumo()
+
+    # O grupo de RJ fica vazio e precisa sumir do resumo
+    crud.excluir_consultas([2, 3])
+    _confere_resumo()
+    assert crud.contar_consultas() == 2
@@ -0,0 +1,37 @@
+import crud
+
+CABECALHO = (
+    "id_consulta,id_paciente,id_medico,data_consulta,especialidade,valor_consulta,status_consulta,"
+    "cidade,estado,forma_pagamento,idade_paciente,sexo_paciente,tempo_espera_min,"
+    "satisfacao_paciente,receita_medicacao\n"
+)
+
+def _linha(numero):
+    return (
+        f"{numero},{1000 + numero},500,2024-07-{numero:02d} 10:00:00,Cardiologia,50.0,realizada,"
+        f"Cidade 1,SP,PIX,40,F,15,4.0,Sim\n"
+    )
+
+def test_sincronizar_retoma_apos_linha_final_incompleta(banco, tmp_path):
+    arquivo = tmp_path / "dataset.csv"
+    completas = "".join(_linha(n) for n in range(1, 4))
+    parcial = _linha(4)
+    arquivo.write_text(CABECALHO + completas + parcial[:20], encoding="utf-8")
+
+    primeira = crud.sincronizar_csv(str(arquivo))
+    assert (primeira["linhas"], primeira["inseridas"]) == (3, 3)
+    # A linha pela metade fica para a próxima sincronização
+    assert primeira["posicao"] == len((CABECALHO + completas).encode("utf-8"))
+    assert crud.estado_sincronizacao(str(arquivo))["posicao"] == primeira["posicao"]
+
+    with open(arquivo, "a", encoding="utf-8") as saida:
+        saida.write(parcial[20:] + _linha(5))
+    segunda = crud.sincronizar_csv(str(arquivo))
+    assert segunda["retomado_de"] == primeira["posicao"]
+    assert (segunda["linhas"], segunda["inseridas"]) == (2, 2)
+
+    # Nada novo: não relê o arquivo nem duplica linhas
+    terceira = crud.sincronizar_csv(str(arquivo))
+    assert (terceira["linhas"], terceira["inseridas"]) == (0, 0)
+    assert crud.contar_consultas() == 5
+    assert sorted(crud.listar_consultas()["id_paciente"]) == [1001, 1002, 1003, 1004, 1005]
@@ -0,0 +1,20 @@
+import pytest
+
+import crud
+import snapshot
+from conftest import consulta
+
+pytest.importorskip("pyarrow")
+
+def test_snapshot_regrava_so_apos_escritas(banco, tmp_path):
+    pasta = str(tmp_path / "snapshot")
+    crud.inserir_consultas([consulta(data=f"2024-0{mes}-10", id_paciente=mes) for mes in (1, 2)])
+    assert not snapshot.snapshot_atualizado(pasta)
+    assert snapshot.atualizar_snapshot(pasta) == [202401, 202402]
+    assert snapshot.snapshot_atualizado(pasta)
+    assert snapshot.atualizar_snapshot(pasta) == []
+
+    crud.atualizar_consultas([(1, consulta(data="2024-02-11", id_paciente=1))])
+    assert not snapshot.snapshot_atualizado(pasta)
+    assert sorted(snapshot.atualizar_snapshot(pasta)) == [202401, 202402]
+    assert len(snapshot.carregar_snapshot({"anos": [2024]}, ["id_consulta"], pasta)) == 2
@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+
+import crud
+from conftest import consulta
+from database import conexao
+
+def _datas():
+    with conexao(somente_leitura=True) as conn:
+        return conn.execute("SELECT data_consulta, ano_mes FROM consultas ORDER BY id_consulta").fetchall()
+
+def test_escrita_de_uma_consulta_recusa_data_fora_do_padrao(banco):
+    with pytest.raises(ValueError, match="data inválida"):
+        crud.inserir_consulta(consulta(data="17/07/2024"))
+    crud.inserir_consulta(consulta(data="2024-07-17"))
+    with pytest.raises(ValueError, match="data inválida"):
+        crud.atualizar_consulta(1, consulta(data="17/07/2024"))
+    assert _datas() == [("2024-07-17", 202407)]
+
+def test_planilha_acusa_celulas_invalidas_por_linha(banco):
+    linhas = [dict(zip(crud.COLUNAS_INSERCAO, consulta())) for _ in range(3)]
+    linhas[1]["valor_consulta"] = "10,5"
+    linhas[2]["data_consulta"] = "04/03/2024"
+    _, tuplas = crud.preparar_planilha(pd.DataFrame(linhas))
+
+    resultado = crud.inserir_consultas(tuplas, tudo_ou_nada=False)
+    assert resultado["sucesso"] == 1
+    assert resultado["falhas"] == [
+        (1, "valor inválido em valor_consulta: '10,5'"),
+        (2, "data inválida em data_consulta (use AAAA-MM-DD): '04/03/2024'"),
+    ]